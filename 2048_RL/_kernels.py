@@ -0,0 +1,173 @@
+"""
+2048 环境的 Numba 编译内核。
+棋盘为 uint64 bitboard（16 个 4-bit log2 nibble，第 r 行第 c 列位于 bit 偏移 16*r + 4*c）。
+所有常量都显式写成 np.uint64，避免 numba 把 uint64 与 int64 混合运算提升成 float64。
+"""
+import numpy as np
+from numba import njit
+
+MAX_EXPONENT = 15
+
+_ROW_MASK = np.uint64(0xFFFF)
+
+
+@njit(cache=True, nogil=True)
+def compress_merge_row(line, out):
+    """
+    先压缩非零到一侧，再从头到尾合并相同的块（合并一次），结果写入 out（左对齐，右侧补 0）。
+    line / out 为长度 4 的 int32 log2 数组，返回本行奖励（按 tile 实际值计算）。
+    """
+    for i in range(4):
+        out[i] = 0
+    gained = 0
+    w = 0  # 下一个写入位置
+    pending = 0  # 等待与后一个 tile 比较的值（0 表示没有）
+    for i in range(4):
+        v = line[i]
+        if v == 0:
+            continue
+        if pending == v and v < MAX_EXPONENT:
+            out[w] = v + 1
+            gained += 1 << (v + 1)
+            w += 1
+            pending = 0
+        else:
+            if pending != 0:
+                out[w] = pending
+                w += 1
+            pending = v
+    if pending != 0:
+        out[w] = pending
+    return gained
+
+
+@njit(cache=True, nogil=True)
+def _reverse_row(row):
+    """把一行的 4 个 nibble 倒序（列 0 <-> 列 3，列 1 <-> 列 2）。"""
+    return (
+        ((row & 0x000F) << 12)
+        | ((row & 0x00F0) << 4)
+        | ((row & 0x0F00) >> 4)
+        | ((row & 0xF000) >> 12)
+    )
+
+
+@njit(cache=True, nogil=True)
+def build_tables(left_table, right_table, reward_table):
+    """枚举所有 65536 种行状态，填充向左/向右移动后的新行与合并奖励。"""
+    line = np.empty(4, dtype=np.int32)
+    out = np.empty(4, dtype=np.int32)
+    for row in range(65536):
+        for c in range(4):
+            line[c] = (row >> (4 * c)) & 0xF
+        reward_table[row] = compress_merge_row(line, out)
+        left_table[row] = out[0] | (out[1] << 4) | (out[2] << 8) | (out[3] << 12)
+    for row in range(65536):
+        right_table[row] = _reverse_row(np.int64(left_table[_reverse_row(row)]))
+
+
+@njit(cache=True, nogil=True)
+def transpose(b):
+    """4x4 nibble 矩阵转置（经典 bitboard mask-and-shift），行列互换。"""
+    a1 = b & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = b & np.uint64(0x0000F0F00000F0F0)
+    a3 = b & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+
+@njit(cache=True, nogil=True)
+def _move_rows(b, table, reward_table):
+    """对 4 行分别查表，返回 (新 bitboard, 奖励)。"""
+    out = np.uint64(0)
+    reward = np.uint32(0)
+    for i in range(4):
+        shift = np.uint64(16 * i)
+        row = (b >> shift) & _ROW_MASK
+        out |= np.uint64(table[row]) << shift
+        reward += reward_table[row]
+    return out, reward
+
+
+@njit(cache=True, nogil=True)
+def move_up(b, left_table, right_table, reward_table):
+    """向上：转置后按向左查表，再转置回来。返回 (新 bitboard, 奖励)。"""
+    out, reward = _move_rows(transpose(b), left_table, reward_table)
+    return transpose(out), reward
+
+
+@njit(cache=True, nogil=True)
+def move_down(b, left_table, right_table, reward_table):
+    """向下：转置后按向右查表，再转置回来。"""
+    out, reward = _move_rows(transpose(b), right_table, reward_table)
+    return transpose(out), reward
+
+
+@njit(cache=True, nogil=True)
+def move_left(b, left_table, right_table, reward_table):
+    """向左：逐行查左移表。"""
+    return _move_rows(b, left_table, reward_table)
+
+
+@njit(cache=True, nogil=True)
+def move_right(b, left_table, right_table, reward_table):
+    """向右：逐行查右移表。"""
+    return _move_rows(b, right_table, reward_table)
+
+
+@njit(cache=True, nogil=True)
+def move(b, action, left_table, right_table, reward_table):
+    """
+    执行动作，返回 (新 bitboard, 奖励)。动作含义：0=上, 1=下, 2=左, 3=右。
+    供批量内核在编译代码内部分派；Python 侧请用 env_2048 中按动作下标取函数的 _MOVES。
+    """
+    if action == 0:
+        return move_up(b, left_table, right_table, reward_table)
+    elif action == 1:
+        return move_down(b, left_table, right_table, reward_table)
+    elif action == 2:
+        return move_left(b, left_table, right_table, reward_table)
+    else:
+        return move_right(b, left_table, right_table, reward_table)
+
+
+# 每个 nibble 的最低位；按位或/与把 nibble 内的 4 位折叠到最低位后，用这些掩码挑出各 nibble 的结果
+_NIBBLE_LSB = np.uint64(0x1111111111111111)
+_HORIZONTAL_LSB = np.uint64(0x0111011101110111)  # 每行前三列：与右侧相邻比较
+_VERTICAL_LSB = np.uint64(0x0000111111111111)  # 前三行：与下方相邻比较
+
+
+@njit(cache=True, nogil=True)
+def _zero_nibbles(x):
+    """返回 x 中值为 0 的 nibble 对应的最低位掩码。"""
+    folded = x | (x >> np.uint64(1)) | (x >> np.uint64(2)) | (x >> np.uint64(3))
+    return ~folded & _NIBBLE_LSB
+
+
+@njit(cache=True, nogil=True)
+def can_move(b):
+    """
+    检查是否还有合法动作：有空格，或存在水平/竖直相邻的可合并 tile。
+    纯 SWAR 位运算，无循环、无分支；两个 nibble 15（32768）相邻不算可合并。
+    """
+    full = b & (b >> np.uint64(1)) & (b >> np.uint64(2)) & (b >> np.uint64(3)) & _NIBBLE_LSB
+    horizontal = _zero_nibbles(b ^ (b >> np.uint64(4))) & _HORIZONTAL_LSB & ~full
+    vertical = _zero_nibbles(b ^ (b >> np.uint64(16))) & _VERTICAL_LSB & ~full
+    return (_zero_nibbles(b) | horizontal | vertical) != np.uint64(0)
+
+
+@njit(cache=True, nogil=True)
+def move_batch(boards, actions, left_table, right_table, reward_table, out_boards, out_rewards):
+    """对一批 bitboard 分别执行各自的动作，结果写入 out_boards / out_rewards。"""
+    for i in range(boards.shape[0]):
+        out_boards[i], out_rewards[i] = move(boards[i], actions[i], left_table, right_table, reward_table)
+
+
+@njit(cache=True, nogil=True)
+def can_move_batch(boards, out):
+    """对一批 bitboard 分别检查是否还有合法动作，结果写入 out。"""
+    for i in range(boards.shape[0]):
+        out[i] = can_move(boards[i])
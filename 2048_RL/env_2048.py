@@ -3,19 +3,88 @@ from gymnasium import spaces
 import numpy as np
 from typing import Tuple, Dict, Any, Optional
 
+import _kernels
+
+
+# ---- Bitboard 表示 ----
+# 整个 4x4 棋盘压缩进一个 64 位整数：16 个 4-bit nibble，每个存 tile 的 log2 值（0 表示空格）。
+# 第 r 行第 c 列位于第 4*r + c 个 nibble（bit 偏移 16*r + 4*c），每一行正好是一个 16 位整数。
+# nibble 最大为 15，即 tile 最大 32768；两个 32768 不再合并。
+
+MAX_EXPONENT = _kernels.MAX_EXPONENT
+
+# 观测边界：nibble -> tile 值 (0, 2, 4, ..., 32768)
+_TILE_VALUES = np.array([0] + [2 ** e for e in range(1, MAX_EXPONENT + 1)], dtype=np.int32)
+_NIBBLE_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+
+def _build_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    枚举所有 65536 种行状态，预计算向左/向右移动后的新行以及合并奖励（由编译内核完成）。
+    同一行向左、向右合并的奖励相同（相等 tile 的连续段合并次数与方向无关），因此只存一张奖励表。
+    """
+    left_table = np.empty(65536, dtype=np.uint16)
+    right_table = np.empty(65536, dtype=np.uint16)
+    reward_table = np.empty(65536, dtype=np.uint32)
+    _kernels.build_tables(left_table, right_table, reward_table)
+    return left_table, right_table, reward_table
+
+
+LEFT_TABLE, RIGHT_TABLE, REWARD_TABLE = _build_tables()
+
+
+# 按动作下标直接取对应方向的专用内核：0=上, 1=下, 2=左, 3=右
+_MOVES = (_kernels.move_up, _kernels.move_down, _kernels.move_left, _kernels.move_right)
+
+
+def move(b: int, action: int) -> Tuple[int, int]:
+    """整盘按动作移动，返回 (新 bitboard, 奖励)。动作含义：0=上, 1=下, 2=左, 3=右"""
+    return _MOVES[action](np.uint64(b), LEFT_TABLE, RIGHT_TABLE, REWARD_TABLE)
+
+
+_NIBBLE_LSB = 0x1111111111111111
+
+
+def empty_mask(b: int) -> int:
+    """
+    返回空格掩码：每个空格 nibble 的最低位置 1，其余位为 0（SWAR 位运算，无循环）。
+    空格数即 mask.bit_count()。
+    """
+    return ~(b | (b >> 1) | (b >> 2) | (b >> 3)) & _NIBBLE_LSB
+
+
+def encode_board(board: np.ndarray) -> int:
+    """4x4 tile 值数组 -> bitboard。"""
+    b = 0
+    for i, v in enumerate(np.asarray(board).ravel().tolist()):
+        if v:
+            b |= (int(v).bit_length() - 1) << (4 * i)
+    return b
+
+
+def decode_board(b: int) -> np.ndarray:
+    """bitboard -> 4x4 int32 tile 值数组（一次向量化查表）。"""
+    nibbles = (np.uint64(b) >> _NIBBLE_SHIFTS) & np.uint64(0xF)
+    return _TILE_VALUES[nibbles].reshape(4, 4)
+
 
 class Game2048Env(gym.Env):
     """
     一个用于强化学习训练的 2048 游戏环境。
-    观测空间：4x4 棋盘的 tile 值（int），也可以自行改成 log2 表示。
+    内部用 64 位 bitboard 存储棋盘，移动通过逐行查表完成；只有在返回观测时才解码成数组。
+    观测空间：4x4 棋盘的 tile 值（int）；log2 表示可通过 get_log2_obs() 直接获取。
     动作空间：0=上, 1=下, 2=左, 3=右
     奖励：当前一步中所有合并产生的 tile 和（标准做法）。
     终止：无合法动作时（所有方向都无法移动）。
+    copy_obs=False：reset/step 返回同一块预分配缓冲区的只读视图（每步原地刷新，省掉每步的数组分配），
+    调用方不能修改它，需要保留历史观测时请自行 copy()；立即转成 torch tensor 的训练循环可直接用 False。
     """
     metadata = {"render.modes": ["human", "ansi"]}
 
-    def __init__(self, board_size: int = 4, seed: Optional[int] = None):
+    def __init__(self, board_size: int = 4, seed: Optional[int] = None, copy_obs: bool = True):
         super().__init__()
+        if board_size != 4:
+            raise ValueError("bitboard 实现只支持 4x4 棋盘")
         self.board_size = board_size
 
         # 4 个离散动作：上、下、左、右
@@ -30,39 +99,65 @@ class Game2048Env(gym.Env):
             dtype=np.int32,
         )
 
-        self.rng = np.random.RandomState(seed)
-        self.board: np.ndarray = np.zeros((self.board_size, self.board_size), dtype=np.int32)
+        self.rng = np.random.default_rng(seed)
+        self._bitboard: int = 0
         self._done: bool = False
 
+        self._copy_obs = copy_obs
+        self._nibble_buf = np.empty(16, dtype=np.uint64)
+        self._obs_buf = np.empty(16, dtype=np.int32)
+        self._obs_view = self._obs_buf.reshape(4, 4).view()
+        self._obs_view.flags.writeable = False
+
+    @property
+    def board(self) -> np.ndarray:
+        """
+        当前棋盘的 4x4 tile 值数组（只读，每次从 bitboard 解码）。
+        原地修改（如 env.board[r, c] = v）会直接报错，要改棋盘请整体赋值 env.board = new_board。
+        """
+        board = decode_board(self._bitboard)
+        board.flags.writeable = False
+        return board
+
+    @board.setter
+    def board(self, value: np.ndarray):
+        self._bitboard = encode_board(value)
+
+    def get_log2_obs(self) -> np.ndarray:
+        """
+        当前棋盘的 4x4 int8 log2 表示（0 表示空格，1 表示 2，……）。
+        bitboard 的 nibble 本身就是 log2 值，直接移位取出即可，不需要对 tile 值调用 np.log2。
+        """
+        nibbles = (np.uint64(self._bitboard) >> _NIBBLE_SHIFTS) & np.uint64(0xF)
+        return nibbles.astype(np.int8).reshape(4, 4)
+
     # ---- Gym 标准接口 ----
 
     def reset(self, *, seed: Optional[int] = None, options: Optional[Dict[str, Any]] = None):
         if seed is not None:
-            self.rng.seed(seed)
-        self.board[:] = 0
+            self.rng = np.random.default_rng(seed)
+        self._bitboard = 0
         self._done = False
         # 初始生成两个 tile
         self._add_random_tile()
         self._add_random_tile()
-        return self.board.copy(), {}
+        return self._observe(), {}
 
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict]:
         assert self.action_space.contains(action), f"Invalid action {action}"
 
         if self._done:
             # 若已经结束，通常 gym 做法是再 reset；这里返回原样
-            return self.board.copy(), 0.0, True, False, {}
+            return self._observe(), 0.0, True, False, {}
 
-        old_board = self.board.copy()
-        reward = self._move(action)
+        reward, changed = self._move(action)
 
         # 如果移动后棋盘没有变化，则视为非法/无效动作，可设置小负奖励（可选）
-        if np.array_equal(old_board, self.board):
+        if not changed:
             # 这里不给惩罚也可以，根据你的算法需求调整
             reward = 0.0
-
-        # 每一步后尝试添加新 tile（如果有空格且动作有效）
-        if not np.array_equal(old_board, self.board):
+        else:
+            # 每一步后尝试添加新 tile（如果有空格且动作有效）
             self._add_random_tile()
 
         self._done = not self._can_move()
@@ -70,7 +165,7 @@ class Game2048Env(gym.Env):
         terminated = self._done
         truncated = False  # 可以根据步数限制等设置
 
-        observation = self.board.copy()
+        observation = self._observe()
         info: Dict[str, Any] = {}
         return observation, float(reward), terminated, truncated, info
 
@@ -85,104 +180,125 @@ class Game2048Env(gym.Env):
 
     # ---- 2048 逻辑实现 ----
 
+    def _observe(self) -> np.ndarray:
+        """返回观测：copy_obs=True 时为新数组，否则原地解码到缓冲区并返回其只读视图。"""
+        if self._copy_obs:
+            return decode_board(self._bitboard)
+        np.right_shift(np.uint64(self._bitboard), _NIBBLE_SHIFTS, out=self._nibble_buf)
+        np.bitwise_and(self._nibble_buf, np.uint64(0xF), out=self._nibble_buf)
+        np.take(_TILE_VALUES, self._nibble_buf, out=self._obs_buf)
+        return self._obs_view
+
     def _add_random_tile(self):
         """在一个随机空格中添加 2 或 4（90% 概率 2，10% 概率 4）"""
-        empty_positions = np.argwhere(self.board == 0)
-        if empty_positions.size == 0:
+        mask = empty_mask(self._bitboard)
+        n_empty = mask.bit_count()
+        if n_empty == 0:
             return
-        idx = self.rng.randint(len(empty_positions))
-        r, c = empty_positions[idx]
-        # 90% 2, 10% 4
-        self.board[r, c] = 4 if self.rng.rand() < 0.1 else 2
+        # 清掉最低的 k 个置位，剩下的最低置位就是均匀选中的第 k 个空格
+        for _ in range(self.rng.integers(n_empty)):
+            mask &= mask - 1
+        shift = (mask & -mask).bit_length() - 1
+        # 90% 2, 10% 4（log2 表示下即 1 或 2）
+        exponent = 2 if self.rng.random() < 0.1 else 1
+        self._bitboard |= exponent << shift
 
     def _can_move(self) -> bool:
         """检查是否还有合法动作。"""
-        # 有空格就可以移动
-        if np.any(self.board == 0):
-            return True
-
-        # 棋盘满时看是否有相邻相等的
-        for r in range(self.board_size):
-            for c in range(self.board_size - 1):
-                if self.board[r, c] == self.board[r, c + 1]:
-                    return True
-        for c in range(self.board_size):
-            for r in range(self.board_size - 1):
-                if self.board[r, c] == self.board[r + 1, c]:
-                    return True
-        return False
-
-    def _move(self, action: int) -> int:
+        return _kernels.can_move(np.uint64(self._bitboard))
+
+    def _move(self, action: int) -> Tuple[int, bool]:
         """
-        执行动作并返回本步奖励。
+        执行动作并返回 (本步奖励, 棋盘是否发生变化)。
         动作含义：0=上, 1=下, 2=左, 3=右
         """
-        reward = 0
-
-        if action == 0:  # 上
-            for c in range(self.board_size):
-                col = self.board[:, c]
-                new_col, gained = self._compress_and_merge(col)
-                self.board[:, c] = new_col
-                reward += gained
-
-        elif action == 1:  # 下
-            for c in range(self.board_size):
-                col = self.board[::-1, c]
-                new_col, gained = self._compress_and_merge(col)
-                self.board[::-1, c] = new_col
-                reward += gained
-
-        elif action == 2:  # 左
-            for r in range(self.board_size):
-                row = self.board[r, :]
-                new_row, gained = self._compress_and_merge(row)
-                self.board[r, :] = new_row
-                reward += gained
-
-        elif action == 3:  # 右
-            for r in range(self.board_size):
-                row = self.board[r, ::-1]
-                new_row, gained = self._compress_and_merge(row)
-                self.board[r, ::-1] = new_row
-                reward += gained
-
-        return reward
-
-    def _compress_and_merge(self, line: np.ndarray) -> Tuple[np.ndarray, int]:
-        """
-        先压缩非零到一侧，再从头到尾合并相同的块（合并一次），最后再压缩一次。
-        返回 (新行, 本行总奖励)。
-        """
-        size = len(line)
-        new_line = line[line != 0]  # 去掉 0
-        gained = 0
-
-        # 如果全是 0
-        if len(new_line) == 0:
-            return np.zeros_like(line), 0
-
-        merged = []
-        skip = False
-        for i in range(len(new_line)):
-            if skip:
-                skip = False
-                continue
-            if i + 1 < len(new_line) and new_line[i] == new_line[i + 1]:
-                merged_value = new_line[i] * 2
-                gained += merged_value
-                merged.append(merged_value)
-                skip = True
-            else:
-                merged.append(new_line[i])
-
-        merged_arr = np.array(merged, dtype=np.int32)
-        # 再次压缩到左侧，右侧补 0
-        result = np.zeros(size, dtype=np.int32)
-        result[: len(merged_arr)] = merged_arr
-        return result, gained
+        new_board, reward = move(self._bitboard, action)
+        changed = new_board != self._bitboard
+        self._bitboard = new_board
+        return reward, changed
 
     def _board_to_string(self) -> str:
         return "\n".join(
             ["\t".join(f"{v:4d}" for v in row) for row in self.board]
-        )
\ No newline at end of file
+        )
+
+
+class Game2048VecEnv:
+    """
+    N 个 2048 环境的批量版本，接口与 gymnasium 的向量环境一致（reset / step 返回批量数组）。
+    所有棋盘存成一个 (N,) uint64 bitboard 数组：移动和终止判断由编译内核批量完成，
+    新 tile 用一次向量化随机数生成为所有环境同时放置，避免 N 次细碎的标量 RNG 调用。
+    自动重置：某个环境终止后在同一步内立即重置，终止时的观测放在 info["final_observation"]。
+    """
+
+    def __init__(self, num_envs: int, seed: Optional[int] = None):
+        self.num_envs = num_envs
+        self.single_action_space = spaces.Discrete(4)
+        self.single_observation_space = spaces.Box(low=0, high=2 ** 16, shape=(4, 4), dtype=np.int32)
+        self.action_space = spaces.MultiDiscrete([4] * num_envs)
+        self.observation_space = spaces.Box(low=0, high=2 ** 16, shape=(num_envs, 4, 4), dtype=np.int32)
+
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros(num_envs, dtype=np.uint64)
+        self._new_boards = np.empty(num_envs, dtype=np.uint64)
+        self._rewards = np.empty(num_envs, dtype=np.uint32)
+        self._alive = np.empty(num_envs, dtype=np.bool_)
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[Dict[str, Any]] = None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.boards[:] = 0
+        # 初始生成两个 tile
+        all_envs = np.ones(self.num_envs, dtype=np.bool_)
+        self._add_random_tiles(all_envs)
+        self._add_random_tiles(all_envs)
+        return self._observe(), {}
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+        actions = np.asarray(actions, dtype=np.int64)
+        _kernels.move_batch(
+            self.boards, actions, LEFT_TABLE, RIGHT_TABLE, REWARD_TABLE, self._new_boards, self._rewards
+        )
+        # 棋盘没有变化的动作视为无效：奖励本来就是 0，也不生成新 tile
+        moved = self._new_boards != self.boards
+        self.boards[:] = self._new_boards
+        self._add_random_tiles(moved)
+
+        _kernels.can_move_batch(self.boards, self._alive)
+        terminated = ~self._alive
+        truncated = np.zeros(self.num_envs, dtype=np.bool_)
+        rewards = self._rewards.astype(np.float64)
+
+        info: Dict[str, Any] = {}
+        if terminated.any():
+            info["final_observation"] = self._observe()
+            self.boards[terminated] = 0
+            self._add_random_tiles(terminated)
+            self._add_random_tiles(terminated)
+
+        return self._observe(), rewards, terminated, truncated, info
+
+    def close(self):
+        pass
+
+    def _observe(self) -> np.ndarray:
+        """(N,) bitboard -> (N, 4, 4) int32 tile 值数组。"""
+        return _TILE_VALUES[self._nibbles()].reshape(self.num_envs, 4, 4)
+
+    def _nibbles(self) -> np.ndarray:
+        """(N,) bitboard -> (N, 16) log2 nibble。"""
+        return (self.boards[:, None] >> _NIBBLE_SHIFTS) & np.uint64(0xF)
+
+    def _add_random_tiles(self, mask: np.ndarray):
+        """
+        为 mask 选中的每个环境在一个随机空格中添加 2 或 4（90% 概率 2，10% 概率 4）。
+        对空格赋 [0,1) 均匀随机数、非空格赋 -1，按行取 argmax 即为均匀选中的空格。
+        """
+        empty = self._nibbles() == 0
+        mask = mask & empty.any(axis=1)
+        u = self.rng.random((self.num_envs, 16))
+        u[~empty] = -1.0
+        idx = u.argmax(axis=1).astype(np.uint64)
+        # log2 表示下 1 或 2
+        exponents = np.where(self.rng.random(self.num_envs) < 0.1, 2, 1).astype(np.uint64)
+        self.boards |= np.where(mask, exponents << (np.uint64(4) * idx), np.uint64(0))
@@ -1,5 +1,5 @@
 # %%
-from env_2048 import Game2048Env
+from env_2048 import Game2048Env, Game2048VecEnv, encode_board, decode_board, move
 import numpy as np
 import time
 import curses
@@ -155,6 +155,130 @@ def test_cannot_move_end():
     assert terminated is True
 
 
+def test_bitboard_four_directions():
+    board = np.array([
+        [2, 2, 4, 0],
+        [0, 4, 0, 4],
+        [2, 0, 0, 8],
+        [2, 4, 0, 8],
+    ], dtype=np.int32)
+    b = encode_board(board)
+    assert np.array_equal(decode_board(b), board)
+
+    up, reward = move(b, 0)
+    assert np.array_equal(decode_board(up), [
+        [4, 2, 4, 4],
+        [2, 8, 0, 16],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+    ])
+    assert reward == 4 + 8 + 16
+
+    down, reward = move(b, 1)
+    assert np.array_equal(decode_board(down), [
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+        [2, 2, 0, 4],
+        [4, 8, 4, 16],
+    ])
+    assert reward == 4 + 8 + 16
+
+    left, reward = move(b, 2)
+    assert np.array_equal(decode_board(left), [
+        [4, 4, 0, 0],
+        [8, 0, 0, 0],
+        [2, 8, 0, 0],
+        [2, 4, 8, 0],
+    ])
+    assert reward == 4 + 8
+
+    right, reward = move(b, 3)
+    assert np.array_equal(decode_board(right), [
+        [0, 0, 4, 4],
+        [0, 0, 0, 8],
+        [0, 0, 2, 8],
+        [0, 2, 4, 8],
+    ])
+    assert reward == 4 + 8
+
+
+def test_log2_obs():
+    env = Game2048Env()
+    env.board = np.array([
+        [2, 4, 0, 0],
+        [0, 8, 0, 0],
+        [0, 0, 1024, 0],
+        [0, 0, 0, 32768],
+    ], dtype=np.int32)
+    log2_obs = env.get_log2_obs()
+    assert log2_obs.dtype == np.int8
+    assert np.array_equal(log2_obs, [
+        [1, 2, 0, 0],
+        [0, 3, 0, 0],
+        [0, 0, 10, 0],
+        [0, 0, 0, 15],
+    ])
+
+
+def test_copy_obs_false_returns_readonly_view():
+    env = Game2048Env(seed=0, copy_obs=False)
+    obs, info = env.reset()
+    assert not obs.flags.writeable
+    assert np.array_equal(obs, env.board)
+    next_obs, reward, terminated, truncated, info = env.step(2)
+    # 同一块缓冲区原地刷新
+    assert next_obs is obs
+    assert np.array_equal(next_obs, env.board)
+
+
+def test_board_is_readonly():
+    env = Game2048Env(seed=0)
+    obs, info = env.reset()
+    # 原地修改 board 会报错，而不是悄悄丢失
+    try:
+        env.board[0, 0] = 2
+        assert False, "env.board 应为只读"
+    except ValueError:
+        pass
+    # copy_obs=True 的观测仍是可写的新数组
+    assert obs.flags.writeable
+
+
+def test_vec_env_step():
+    env = Game2048VecEnv(3, seed=0)
+    env.reset()
+    env.boards[0] = encode_board(np.array([
+        [2, 2, 0, 0],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+    ]))
+    # 向左无法移动的棋盘：不应生成新 tile
+    stuck = encode_board(np.array([
+        [2, 0, 0, 0],
+        [4, 0, 0, 0],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+    ]))
+    env.boards[1] = stuck
+    env.boards[2] = encode_board(np.array([
+        [2, 4, 2, 4],
+        [4, 2, 4, 2],
+        [2, 4, 2, 4],
+        [4, 2, 4, 2],
+    ]))
+
+    obs, rewards, terminated, truncated, info = env.step(np.array([2, 2, 2]))
+    assert obs.shape == (3, 4, 4)
+    assert obs[0, 0, 0] == 4
+    assert np.count_nonzero(obs[0]) == 2  # 合并后的 4 加上一个新 tile
+    assert rewards[0] == 4
+    assert env.boards[1] == stuck and rewards[1] == 0
+    assert terminated.tolist() == [False, False, True]
+    # 终止的环境在同一步内自动重置
+    assert np.count_nonzero(info["final_observation"][2]) == 16
+    assert np.count_nonzero(obs[2]) == 2
+
 if __name__ == "__main__":
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(description="2048 Gym Env demo with different agents.")
@@ -3,15 +3,21 @@ import matplotlib.pyplot as plt
 import os
 
 
+def get_sigma_vec(t, sigma_init=1.0, sigma_final=0.1, T=500000):
+    """
+    get_sigma 的向量化版本：t 可以是任意形状的数组，逐元素计算 sigma。
+    """
+    # 计算衰减比例，确保不大于 1
+    decay_ratio = np.minimum(np.asarray(t, dtype=np.float64) / T, 1.0)
+    # 线性插值计算当前 sigma
+    return sigma_init + (1.0 - decay_ratio) * (sigma_final - sigma_init)
+
+
 def get_sigma(t, sigma_init=1.0, sigma_final=0.1, T=500000):
     """
     根据步数 t 线性衰减噪声标准差 sigma。
     """
-    # 计算衰减比例，确保不小于 0 且不大于 1
-    decay_ratio = min(t / T, 1.0)
-    # 线性插值计算当前 sigma
-    sigma_t = sigma_init + (1.0 - decay_ratio) * (sigma_final - sigma_init)
-    return sigma_t
+    return get_sigma_vec(t, sigma_init, sigma_final, T).item()
 
 
 def plot_sigma_curve(
@@ -27,8 +33,8 @@ def plot_sigma_curve(
     """
     # 生成步数
     t_values = np.linspace(0, 2*T, num_points)
-    # 计算对应的 sigma
-    sigma_values = [get_sigma(t, sigma_init, sigma_final, T) for t in t_values]
+    # 计算对应的 sigma（一次向量化计算）
+    sigma_values = get_sigma_vec(t_values, sigma_init, sigma_final, T)
 
     # 创建保存目录
     os.makedirs(save_dir, exist_ok=True)
@@ -1,10 +1,15 @@
 """
 爬取DBLP网站2024年ICRA会议论文标题
 """
-import requests
+from datetime import timedelta
+from requests_cache import CachedSession
 from bs4 import BeautifulSoup
 import csv
 
+# DBLP 页面缓存（各爬虫共用，24 小时后条件请求重新验证）
+DBLP_CACHE = "/home/cuhk/Documents/Test_lx/Find_Paper/dblp_cache"
+SESSION = CachedSession(DBLP_CACHE, expire_after=timedelta(days=1))
+
 def scrape_icra_titles():
     """爬取ICRA 2024论文标题"""
     url = "https://dblp.org/db/conf/icra/icra2024.html"
@@ -16,16 +21,16 @@ def scrape_icra_titles():
 
     print(f"正在访问: {url}")
 
-    # 发送请求
-    response = requests.get(url, headers=headers)
+    # 发送请求（优先命中本地缓存）
+    response = SESSION.get(url, headers=headers)
     response.raise_for_status()
 
-    # 解析HTML
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # 解析HTML（直接传入原始字节，由 lxml 按页面声明的编码解码）
+    soup = BeautifulSoup(response.content, 'lxml')
 
-    # 查找所有标题
+    # 查找所有论文条目 (<li class="entry inproceedings">) 中的标题
     titles = []
-    title_elements = soup.find_all('span', class_='title')
+    title_elements = soup.select('li.entry.inproceedings span.title')
 
     for elem in title_elements:
         title = elem.get_text(strip=True)
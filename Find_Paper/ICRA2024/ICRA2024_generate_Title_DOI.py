@@ -1,10 +1,15 @@
 """
 爬取DBLP网站2024年ICRA会议论文标题和DOI链接
 """
-import requests
+from datetime import timedelta
+from requests_cache import CachedSession
 from bs4 import BeautifulSoup
 import csv
 
+# DBLP 页面缓存（各爬虫共用，24 小时后条件请求重新验证）
+DBLP_CACHE = "/home/cuhk/Documents/Test_lx/Find_Paper/dblp_cache"
+SESSION = CachedSession(DBLP_CACHE, expire_after=timedelta(days=1))
+
 def scrape_icra_titles_with_links():
     """爬取ICRA 2024论文标题和DOI链接"""
     url = "https://dblp.org/db/conf/icra/icra2024.html"
@@ -16,12 +21,12 @@ def scrape_icra_titles_with_links():
 
     print(f"正在访问: {url}")
 
-    # 发送请求
-    response = requests.get(url, headers=headers)
+    # 发送请求（优先命中本地缓存）
+    response = SESSION.get(url, headers=headers)
     response.raise_for_status()
 
-    # 解析HTML
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # 解析HTML（直接传入原始字节，由 lxml 按页面声明的编码解码）
+    soup = BeautifulSoup(response.content, 'lxml')
 
     # 查找所有论文条目 (<li class="entry inproceedings">)
     paper_entries = soup.find_all('li', class_='entry inproceedings')
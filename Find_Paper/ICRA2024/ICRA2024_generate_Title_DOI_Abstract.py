@@ -1,11 +1,17 @@
 """
-根据DOI提取ICRA 2024论文摘要 (使用代理)
+根据DOI提取ICRA 2024论文摘要 (使用代理，多线程并发)
 """
 import requests
-import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import json
 import csv
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from tqdm import tqdm
 
 # 代理设置
 PROXY = "http://127.0.0.1:7897"
@@ -14,40 +20,120 @@ PROXIES = {
     'https': PROXY,
 }
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+# 并发设置
+MAX_WORKERS = 8
+MIN_INTERVAL_PER_HOST = 0.25  # 同一域名相邻两次请求的最小间隔（秒）
+
+# 超时、连接错误或 429/5xx 时按指数退避自动重试（0.5s、1s、2s），不再一次失败就放弃
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+
+# 所有线程共享一个 Session：HTTP keep-alive，每个域名只需一次 TLS 握手
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.proxies.update(PROXIES)
+SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=RETRY))
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=RETRY))
+
+
+class HostRateLimiter:
+    """按域名限速：同一域名相邻两次请求至少间隔 min_interval 秒，不同域名互不影响"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_time = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time.get(host, now))
+            self._next_time[host] = start + self.min_interval
+        delay = start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+RATE_LIMITER = HostRateLimiter(MIN_INTERVAL_PER_HOST)
+
+# 摘要字段的键名；用 str.find 定位，代替对整页 HTML 做正则回溯匹配
+ABSTRACT_KEY = '"abstract"'
+
+def find_abstract(html):
+    """
+    线性扫描 "abstract": "..." 字段，返回第一个非"true"且长度大于 10 的摘要（JSON 转义未解码）；找不到返回空字符串。
+    """
+    n = len(html)
+    pos = html.find(ABSTRACT_KEY)
+    while pos >= 0:
+        # 跳过键名后的空白、冒号、空白，下一个字符必须是开引号
+        i = pos + len(ABSTRACT_KEY)
+        while i < n and html[i].isspace():
+            i += 1
+        if i < n and html[i] == ':':
+            i += 1
+            while i < n and html[i].isspace():
+                i += 1
+            if i < n and html[i] == '"':
+                # 找第一个前面有偶数个反斜杠（即未被转义）的引号作为结束引号
+                end = html.find('"', i + 1)
+                while end >= 0:
+                    backslashes = 0
+                    while html[end - 1 - backslashes] == '\\':
+                        backslashes += 1
+                    if backslashes % 2 == 0:
+                        break
+                    end = html.find('"', end + 1)
+                if end < 0:
+                    return ""
+                match = html[i + 1:end]
+                if match != 'true' and len(match) > 10:
+                    return match
+                pos = html.find(ABSTRACT_KEY, end + 1)
+                continue
+        pos = html.find(ABSTRACT_KEY, pos + 1)
+    return ""
+
+def decode_json_string(s):
+    """解码 JSON 字符串内容（不含两侧引号）：交给 C 实现的 json 解码器，能正确处理 \\uXXXX 与非 ASCII 字符"""
+    try:
+        return json.loads('"' + s + '"', strict=False)
+    except ValueError:
+        # 转义不合法时退回原来的解码方式
+        return s.encode().decode('unicode-escape')
+
 def extract_abstract_from_doi(doi_url):
     """从DOI页面提取摘要"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    }
-
     try:
-        response = requests.get(doi_url, headers=headers, proxies=PROXIES, timeout=30)
+        RATE_LIMITER.wait(doi_url)
+        response = SESSION.get(doi_url, timeout=30)
         response.raise_for_status()
         html = response.text
 
-        # 查找摘要 - 从 "abstract":" 开始
-        abstract_pattern = r'"abstract"\s*:\s*"((?:[^"\\]|\\.)+)"'
-        matches = re.findall(abstract_pattern, html)
-
-        if matches:
-            # 获取第一个非"true"的匹配
-            for match in matches:
-                if match != 'true' and len(match) > 10:
-                    # 解码转义字符
-                    abstract = match.encode().decode('unicode-escape')
-                    return abstract
+        # 查找摘要 - 从 "abstract":" 开始，取到第一个有效摘要就停止扫描
+        match = find_abstract(html)
+        if match:
+            # 解码转义字符
+            return decode_json_string(match)
 
         return ""
 
     except Exception as e:
-        print(f"  错误: {e}")
+        # tqdm.write 在进度条上方输出，不打乱进度条
+        tqdm.write(f"  错误: {e}")
         return ""
 
 def scrape_abstracts():
     """爬取所有论文的摘要"""
     input_file = "/home/cuhk/Documents/Test_lx/Find_Paper/ICRA2024/ICRA2024_Title_DOI_Abstract.csv"
     output_file = "/home/cuhk/Documents/Test_lx/Find_Paper/ICRA2024/ICRA2024_Title_DOI_Abstract.csv"
+    # 断点文件：每成功提取一篇就追加一行，不再每篇都重写整个 CSV
+    checkpoint_file = output_file + ".partial"
 
     # 读取CSV文件
     rows = []
@@ -55,41 +141,61 @@ def scrape_abstracts():
         reader = csv.reader(f)
         rows = list(reader)
 
+    # 读取上次中断前已提取的摘要 (DOI -> 摘要)
+    done = {}
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if len(row) >= 3 and row[2]:
+                    done[row[1]] = row[2]
+        print(f"从断点文件恢复 {len(done)} 篇摘要: {checkpoint_file}")
+
     print(f"共需处理 {len(rows) - 1} 篇论文")
 
-    # 跳过表头，处理每一行
+    # 跳过表头，筛出还没有摘要的行
+    pending = []
     for i in range(1, len(rows)):
-        title = rows[i][0]
-        doi = rows[i][1]
-
-        print(f"[{i}/{len(rows)-1}] 正在处理: {title[:50]}...")
-
         # 确保行有3列
         while len(rows[i]) < 3:
             rows[i].append("")
 
+        doi = rows[i][1]
+        if not rows[i][2] and doi in done:
+            rows[i][2] = done[doi]
+
         # 如果已经有摘要，跳过
-        if rows[i][2]:
-            print("  已有摘要，跳过")
-            continue
-
-        # 提取摘要
-        abstract = extract_abstract_from_doi(doi)
-
-        if abstract:
-            rows[i][2] = abstract
-            print(f"  摘要提取成功 ({len(abstract)} 字符)")
-        else:
-            rows[i][2] = ""
-            print("  未找到摘要")
-
-        # 每处理一篇就保存一次，避免数据丢失
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-
-        # 延迟避免请求过快
-        time.sleep(2)
+        if not rows[i][2]:
+            pending.append(i)
+
+    print(f"已有摘要 {len(rows) - 1 - len(pending)} 篇，待提取 {len(pending)} 篇")
+
+    # 多线程并发抓取，结果回到主线程统一写断点文件
+    # 提取成功由进度条显示，不再逐篇打印；未找到摘要的论文用 tqdm.write 输出
+    with open(checkpoint_file, 'a', newline='', encoding='utf-8') as checkpoint, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+            tqdm(total=len(pending), desc="处理进度", unit="篇", mininterval=0.5) as pbar:
+        checkpoint_writer = csv.writer(checkpoint)
+        futures = {executor.submit(extract_abstract_from_doi, rows[i][1]): i for i in pending}
+
+        for future in as_completed(futures):
+            i = futures[future]
+            abstract = future.result()
+
+            if abstract:
+                rows[i][2] = abstract
+                # 追加到断点文件，避免数据丢失
+                checkpoint_writer.writerow(rows[i])
+                checkpoint.flush()
+            else:
+                rows[i][2] = ""
+                tqdm.write(f"未找到摘要: {rows[i][0][:50]}...")
+            pbar.update(1)
+
+    # 全部处理完后一次性写出完整文件，再删除断点文件
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+    os.remove(checkpoint_file)
 
     print(f"\n完成！结果已保存到: {output_file}")
 
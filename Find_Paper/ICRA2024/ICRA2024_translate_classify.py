@@ -1,12 +1,13 @@
-import json
+import asyncio
 import os
 import re
 from typing import Dict, Any, List
 
+import orjson
 import pandas as pd
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import itertools
+import pyarrow.csv as pacsv
+from openai import AsyncOpenAI
+from tqdm import tqdm
 
 # ===========================
 # 🤖 提示词（Prompt）配置区
@@ -36,31 +37,30 @@ SYSTEM_PROMPT = f'''你是一名机器人领域的科研助理，当前任务是
 
 请严格仅输出 JSON 格式的字符串，不要输出任何额外说明或 Markdown 格式。
 你必须严格遵循以下 **JSON** 格式输出：
-{json.dumps(JSON_OUTPUT_TEMPLATE, ensure_ascii=False, indent=2)}
+{orjson.dumps(JSON_OUTPUT_TEMPLATE, option=orjson.OPT_INDENT_2).decode()}
 '''
 
 # ===========================
-# 核心函数：DeepSeek 论文分析（线程安全）
+# 核心函数：DeepSeek 论文分析（异步，按 API key 限流）
 # ===========================
 
-def deepseek_analyze_paper_json(title: str, doi: str, abstract: str, api_key: str) -> Dict[str, Any]:
+async def deepseek_analyze_paper_json(title: str, doi: str, abstract: str, client: AsyncOpenAI, sem: asyncio.Semaphore) -> Dict[str, Any]:
     user_prompt = f"论文标题：{title}\nDOI：{doi}\n摘要：{abstract}"
-    
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'},
-            stream=False,
-            temperature=0.0
-        )
+        async with sem:
+            response = await client.chat.completions.create(
+                model="deepseek-chat",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                response_format={'type': 'json_object'},
+                stream=False,
+                temperature=0.0
+            )
         raw_output = response.choices[0].message.content.strip()
-        result = json.loads(raw_output)
+        result = orjson.loads(raw_output)
         result['Title'] = title
         result['DOI'] = doi
         result['Abstract'] = abstract
@@ -68,7 +68,8 @@ def deepseek_analyze_paper_json(title: str, doi: str, abstract: str, api_key: st
 
     except Exception as e:
         error_msg = f"API 或解析失败: {str(e)[:50]}"
-        print(f"❌ 错误: {error_msg} (标题: {title[:30]}...)")
+        # tqdm.write 在进度条上方输出，不打乱进度条
+        tqdm.write(f"❌ 错误: {error_msg} (标题: {title[:30]}...)")
         return {
             "Title": title,
             "标题": "N/A",
@@ -79,11 +80,54 @@ def deepseek_analyze_paper_json(title: str, doi: str, abstract: str, api_key: st
             "设备": "其他"
         }
 
+# ===========================
+# 并发调度：每个 API key 一个客户端 + 一个信号量
+# ===========================
+
+async def analyze_tasks(tasks_to_run: List[Dict[str, Any]], api_keys: List[str], per_key_concurrency: int) -> List[tuple]:
+    """
+    把任务轮流分配给各个 API key，每个 key 同时最多 per_key_concurrency 个请求在途。
+    任务是纯网络 IO，单线程事件循环即可同时挂起全部请求。
+    """
+    clients = [AsyncOpenAI(api_key=key, base_url="https://api.deepseek.com") for key in api_keys]
+    sems = [asyncio.Semaphore(per_key_concurrency) for _ in api_keys]
+
+    async def run(i: int, task: Dict[str, Any]):
+        k = i % len(clients)
+        result = await deepseek_analyze_paper_json(task['title'], task['doi'], task['abstract'], clients[k], sems[k])
+        return task['index'], result
+
+    results_list = []
+    try:
+        # 完成情况由进度条显示，不再逐篇打印
+        with tqdm(total=len(tasks_to_run), desc="处理进度", unit="篇", mininterval=0.5) as pbar:
+            for coro in asyncio.as_completed([run(i, task) for i, task in enumerate(tasks_to_run)]):
+                try:
+                    idx, result = await coro
+                    results_list.append((idx, result))
+                except Exception as e:
+                    tqdm.write(f"❌ 任务执行错误: {e}")
+                pbar.update(1)
+    finally:
+        for client in clients:
+            await client.close()
+    return results_list
+
 # ===========================
 # 批量处理 CSV：自动输出路径 + 断点续传 + 并发
 # ===========================
 
-def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
+def read_csv_arrow(path: str) -> pd.DataFrame:
+    """用 pyarrow 多线程读取 CSV；摘要和翻译结果的单元格里可能带换行，必须开启 newlines_in_values"""
+    table = pacsv.read_csv(
+        path,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        # 空单元格读成缺失值，与 pd.read_csv 一致
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True),
+    )
+    return table.to_pandas()
+
+def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], per_key_concurrency: int = 5):
     # 确保输出目录存在
     output_dir = os.path.dirname(output_path)
     os.makedirs(output_dir, exist_ok=True)
@@ -96,8 +140,8 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
     }
     RESULT_COLS = list(RESULT_COL_MAP.values())
 
-    # 1. 读取原始数据
-    df_original = pd.read_csv(input_path)
+    # 1. 读取原始数据（pyarrow：多线程 C++ 解析，长文本摘要的 CSV 读取更快）
+    df_original = read_csv_arrow(input_path)
     if "Title" not in df_original.columns or "DOI" not in df_original.columns or "Abstract" not in df_original.columns:
         raise ValueError("输入 CSV 文件缺少必要列：Title, DOI, Abstract")
 
@@ -105,7 +149,7 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
     df_results = None
     if os.path.exists(output_path):
         print(f"✅ 检测到已有输出文件，尝试读取已处理结果：{output_path}")
-        df_results = pd.read_csv(output_path)
+        df_results = read_csv_arrow(output_path)
         # 清理列名中的空格
         df_results.columns = df_results.columns.str.strip()
         if "Title" not in df_results.columns:
@@ -120,66 +164,39 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
         if col not in df_final.columns:
             df_final[col] = None
 
-    # 4. 同步已有结果
+    # 4. 同步已有结果（按标题对齐，整列批量写入）
     synced_count = 0
     if df_results is not None:
-        # 构建处理数据的映射
-        processed_data = {}
-        for idx, row in df_results.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title:
-                continue
-            processed_data[title] = {
-                "标题": row.get("标题", "N/A"),
-                "摘要": row.get("摘要", "N/A"),
-                "关键词": row.get("关键词", "N/A"),
-                "设备": row.get("设备", "其他")
-            }
-        
-        # 同步数据
-        for idx, row in df_final.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title or title.lower() in ("nan", "none"):
-                continue
-            if title in processed_data:
-                data = processed_data[title]
-                device_value = data.get("设备", "")
-                is_filled = (
-                    isinstance(device_value, str)
-                    and device_value.strip().lower() not in ["", "none", "nan", "n/a"]
-                    and pd.notna(device_value)
-                )
-                if is_filled:
-                    df_final.loc[idx, "标题"] = data.get("标题", "N/A")
-                    df_final.loc[idx, "摘要"] = data.get("摘要", "N/A")
-                    df_final.loc[idx, "关键词"] = data.get("关键词", "N/A")
-                    df_final.loc[idx, "设备"] = data.get("设备", "其他")
-                    synced_count += 1
+        # 已处理结果按标题去重（同名保留最后一条），缺失的结果列用默认值补齐
+        processed = df_results.assign(Title=df_results["Title"].astype(str).str.strip())
+        processed = processed[processed["Title"] != ""].drop_duplicates("Title", keep="last").set_index("Title")
+        for col, default in {"标题": "N/A", "摘要": "N/A", "关键词": "N/A", "设备": "其他"}.items():
+            if col not in processed.columns:
+                processed[col] = default
+
+        # 只同步"设备"已填写的结果
+        device = processed["设备"]
+        is_filled = device.map(lambda v: isinstance(v, str)) & ~device.astype(str).str.strip().str.lower().isin(["", "none", "nan", "n/a"])
+        processed = processed.loc[is_filled, RESULT_COLS]
+
+        titles = df_final["Title"].astype(str).str.strip()
+        matched = titles.isin(processed.index) & ~titles.str.lower().isin(["", "nan", "none"])
+        df_final.loc[matched, RESULT_COLS] = processed.loc[titles[matched], RESULT_COLS].to_numpy()
+        synced_count = int(matched.sum())
         print(f"   已同步 {synced_count} 条已处理结果到当前批次。")
 
-    # 5. 收集待处理任务
-    tasks_to_run = []
+    # 5. 收集待处理任务（每列只做一次 string 转换 + strip，缺失值按空字符串处理，不再逐行 iterrows）
     total_rows = len(df_final)
-    for idx, row in df_final.iterrows():
-        title = str(row.get("Title", "")).strip()
-        doi = str(row.get("DOI", "")).strip()
-        abstract = str(row.get("Abstract", "")).strip()
-        
-        if not title or title.lower() in ("nan", "none"):
-            continue
-
-        device_value = row.get("设备")
-        is_processed = False
-        if isinstance(device_value, str) and device_value.strip().lower() not in ["", "none", "nan", "n/a"]:
-            is_processed = True
-        elif pd.notna(device_value):
-            is_processed = False
-
-        if is_processed:
-            print(f"⏩ 跳过已处理 [{idx+1}/{total_rows}]: {title[:50]}...")
-            continue
-
-        tasks_to_run.append({'index': idx, 'title': title, 'doi': doi, 'abstract': abstract})
+    text = df_final[["Title", "DOI", "Abstract", "设备"]].apply(lambda col: col.astype("string").str.strip().fillna(""))
+    valid = ~text["Title"].str.lower().isin(["", "nan", "none"])
+    is_processed = ~text["设备"].str.lower().isin(["", "none", "nan", "n/a"])
+    skipped_count = int((valid & is_processed).sum())
+    if skipped_count:
+        print(f"⏩ 跳过已处理 {skipped_count} 行")
+
+    pending = text.loc[valid & ~is_processed, ["Title", "DOI", "Abstract"]]
+    pending.columns = ["title", "doi", "abstract"]
+    tasks_to_run = pending.rename_axis("index").reset_index().to_dict("records")
 
     rows_to_process = len(tasks_to_run)
     print(f"\n--- 待处理总行数: {total_rows} | 新任务数: {rows_to_process} ---")
@@ -189,34 +206,17 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
         return
 
     # 6. 并发处理
-    api_key_cycler = itertools.cycle(api_keys)
-    max_workers = min(len(api_keys), 10)  # 防止线程过多（可调）
-    results_list = []
+    results_list = asyncio.run(analyze_tasks(tasks_to_run, api_keys, per_key_concurrency))
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {}
-        for task in tasks_to_run:
-            idx = task['index']
-            title = task['title']
-            doi = task['doi']
-            abstract = task['abstract']
-            key = next(api_key_cycler)
-            future = executor.submit(deepseek_analyze_paper_json, title, doi, abstract, key)
-            futures[future] = idx
-
-        for future in as_completed(futures):
-            idx = futures[future]
-            try:
-                result = future.result()
-                results_list.append((idx, result))
-                print(f"✔ 完成 [{idx+1}/{total_rows}] | 设备: {result.get('设备', 'N/A')} | 标题: {result.get('Title', 'N/A')[:80]}...")
-            except Exception as e:
-                print(f"❌ 线程执行错误 (Index: {idx}): {e}")
-
-    # 7. 更新并保存
-    for idx, result in results_list:
-        for json_key, csv_col in RESULT_COL_MAP.items():
-            df_final.at[idx, csv_col] = result.get(json_key, "N/A")
+    # 7. 更新并保存（所有结果一次性写回）
+    if results_list:
+        updates = pd.DataFrame.from_dict(
+            {idx: {csv_col: result.get(json_key, "N/A") for json_key, csv_col in RESULT_COL_MAP.items()} for idx, result in results_list},
+            orient='index',
+        )
+        rows = df_final.index.get_indexer(updates.index)
+        cols = df_final.columns.get_indexer(RESULT_COLS)
+        df_final.iloc[rows, cols] = updates[RESULT_COLS].to_numpy()
 
     df_final.to_csv(output_path, index=False, encoding='utf-8-sig')
 
@@ -229,19 +229,10 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
 # 主程序入口
 # ======================
 if __name__ == "__main__":
-    # API密钥列表
-    API_KEYS = [
-        "sk-8c38624bafb9477fb237ab2e58948c1b",
-        "sk-4d5cc37a8b17417c87ed33b94d7b06a7",
-        "sk-ab036985ba2c452f8262f4922e8ab50c",
-        "sk-989bea94ce2b47e59714145005afc87e",
-        "sk-29bc65dfb2de4ed3a983741f815ad2d7",
-        "sk-064831a959c84353b6c4979fa90d16f3",
-        "sk-82923973f2ff4ef895824595474f0df6",
-        "sk-f0556cdf91f74729b7615d46fad4091c",
-        "sk-6019eb2fda48482aa2218d3283f8332d",
-        "sk-c19ad12b9f4b4b078270651858bb7f68",
-    ]
+    # API密钥（环境变量 DEEPSEEK_KEYS，逗号分隔）
+    API_KEYS = tuple(key.strip() for key in os.environ.get("DEEPSEEK_KEYS", "").split(",") if key.strip())
+    if not API_KEYS:
+        raise SystemExit("❌ 请先设置环境变量 DEEPSEEK_KEYS，例如：export DEEPSEEK_KEYS=sk-xxx,sk-yyy")
 
     # 输入输出路径
     INPUT_CSV = r"/home/cuhk/Documents/Test_lx/Find_Paper/ICRA2024_Title_DOI_Abstract.csv"
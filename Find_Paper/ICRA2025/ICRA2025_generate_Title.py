@@ -1,10 +1,15 @@
 """
 爬取DBLP网站2025年ICRA会议论文标题
 """
-import requests
+from datetime import timedelta
+from requests_cache import CachedSession
 from bs4 import BeautifulSoup
 import csv
 
+# DBLP 页面缓存（各爬虫共用，24 小时后条件请求重新验证）
+DBLP_CACHE = "/home/cuhk/Documents/Test_lx/Find_Paper/dblp_cache"
+SESSION = CachedSession(DBLP_CACHE, expire_after=timedelta(days=1))
+
 # 设置VPN代理
 proxies = {
     'http': 'http://127.0.0.1:7897',
@@ -22,20 +27,20 @@ def scrape_icra_titles():
 
     print(f"正在访问: {url}")
 
-    # 发送请求，使用代理
+    # 发送请求，使用代理（优先命中本地缓存）
     try:
-        response = requests.get(url, headers=headers, proxies=proxies, timeout=30)
+        response = SESSION.get(url, headers=headers, proxies=proxies, timeout=30)
         response.raise_for_status()
     except Exception as e:
         print(f"请求失败: {e}")
         return []
 
-    # 解析HTML
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # 解析HTML（直接传入原始字节，由 lxml 按页面声明的编码解码）
+    soup = BeautifulSoup(response.content, 'lxml')
 
-    # 查找所有标题
+    # 查找所有论文条目 (<li class="entry inproceedings">) 中的标题
     titles = []
-    title_elements = soup.find_all('span', class_='title')
+    title_elements = soup.select('li.entry.inproceedings span.title')
 
     for elem in title_elements:
         title = elem.get_text(strip=True)
@@ -1,14 +1,18 @@
 """
 翻译ICRA2025论文标题和摘要
 """
-import json
+import codecs
 import os
+import random
 import time
-import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Any, List
 
+import orjson
 import pandas as pd
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
 from tqdm import tqdm
 
 # ===========================
@@ -31,13 +35,29 @@ SYSTEM_PROMPT = f'''你是一名专业的翻译助手，擅长将英文科技论
 
 请严格仅输出 JSON 格式的字符串，不要输出任何额外说明或 Markdown 格式。
 你必须严格遵循以下 **JSON** 格式输出：
-{json.dumps(JSON_OUTPUT_TEMPLATE, ensure_ascii=False, indent=2)}
+{orjson.dumps(JSON_OUTPUT_TEMPLATE, option=orjson.OPT_INDENT_2).decode()}
 '''
 
 # ===========================
 # 核心函数：DeepSeek 翻译（线程安全）
 # ===========================
 
+# 重试设置：限流、服务端错误、连接/超时错误以及输出不是合法 JSON 时，按指数退避（带随机抖动）重试
+MAX_RETRIES = 3
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError, orjson.JSONDecodeError)
+
+# 每个 API key 只创建一个客户端，各线程共享其 HTTP 连接池，避免每篇论文都重新建立 TLS 连接
+_CLIENTS: Dict[str, OpenAI] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(api_key: str) -> OpenAI:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            # 重试统一由 deepseek_translate_paper_json 负责，关闭客户端自带的重试，避免重试次数相乘
+            client = _CLIENTS[api_key] = OpenAI(api_key=api_key, base_url="https://api.deepseek.com", max_retries=0)
+        return client
+
 def deepseek_translate_paper_json(title: str, doi: str, abstract: str, api_key: str) -> Dict[str, Any]:
     # 处理空摘要的情况
     if not abstract or abstract.strip() in ["", "N/A", "nan", "None"]:
@@ -51,42 +71,63 @@ def deepseek_translate_paper_json(title: str, doi: str, abstract: str, api_key:
     
     user_prompt = f"论文标题：{title}\nDOI：{doi}\n摘要：{abstract}"
     
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'},
-            stream=False,
-            temperature=0.0
-        )
-        raw_output = response.choices[0].message.content.strip()
-        result = json.loads(raw_output)
-        result['Title'] = title
-        result['DOI'] = doi
-        result['Abstract'] = abstract
-        return result
-
-    except Exception as e:
-        error_msg = f"API 或解析失败: {str(e)[:50]}"
-        print(f"❌ 错误: {error_msg} (标题: {title[:30]}...)")
-        return {
-            "Title": title,
-            "标题": "",
-            "DOI": doi,
-            "Abstract": abstract,
-            "摘要": ""
-        }
+    client = get_client(api_key)
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = client.chat.completions.create(
+                model="deepseek-chat",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                response_format={'type': 'json_object'},
+                stream=False,
+                temperature=0.0
+            )
+            raw_output = response.choices[0].message.content.strip()
+            result = orjson.loads(raw_output)
+            result['Title'] = title
+            result['DOI'] = doi
+            result['Abstract'] = abstract
+            return result
+
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(2 ** attempt + random.random())
+        except Exception as e:
+            last_error = e
+            break
+
+    error_msg = f"API 或解析失败: {str(last_error)[:50]}"
+    # tqdm.write 在进度条上方输出，不打乱进度条
+    tqdm.write(f"❌ 错误: {error_msg} (标题: {title[:30]}...)")
+    return {
+        "Title": title,
+        "标题": "",
+        "DOI": doi,
+        "Abstract": abstract,
+        "摘要": ""
+    }
+
+# 每个工作线程在启动时固定领取一个 API key，之后只用这个 key，各 key 的并发数严格等于 workers_per_key
+_WORKER = threading.local()
+
+def _init_worker(key_queue: queue.SimpleQueue):
+    _WORKER.api_key = key_queue.get_nowait()
+
+def translate_with_worker_key(title: str, doi: str, abstract: str) -> Dict[str, Any]:
+    return deepseek_translate_paper_json(title, doi, abstract, _WORKER.api_key)
 
 # ===========================
 # 批量处理 CSV：自动输出路径 + 断点续传
 # ===========================
 
-def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
+# to_csv 每次序列化并写出的行数，限制写出时的峰值内存
+WRITE_CHUNKSIZE = 50_000
+
+def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], workers_per_key: int = 2, chunksize: int = 10_000):
     # 确保输出目录存在
     output_dir = os.path.dirname(output_path)
     os.makedirs(output_dir, exist_ok=True)
@@ -97,15 +138,8 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
     }
     RESULT_COLS = list(RESULT_COL_MAP.values())
 
-    # 1. 读取原始数据
-    # 使用names参数来指定列名，忽略第一行的列名
-    df_original = pd.read_csv(input_path, names=['Title', 'DOI', 'Abstract'], skiprows=1)
-    
-    # 处理可能的空值
-    df_original = df_original.fillna('')
-
-    # 2. 尝试加载已有结果（用于续传）
-    df_results = None
+    # 1. 尝试加载已有结果（用于续传），只保留按标题去重后的结果列
+    processed = None
     if os.path.exists(output_path):
         print(f"✅ 检测到已有输出文件，尝试读取已处理结果：{output_path}")
         df_results = pd.read_csv(output_path)
@@ -113,125 +147,118 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
         df_results.columns = df_results.columns.str.strip()
         if "Title" not in df_results.columns:
             print("⚠️ 警告: 输出文件缺少 'Title' 列，将忽略已存在的结果。")
-            df_results = None
+        else:
+            # 已处理结果按标题去重（同名保留最后一条），缺失的结果列用空字符串补齐
+            processed = df_results.assign(Title=df_results["Title"].astype(str).str.strip())
+            processed = processed[processed["Title"] != ""].drop_duplicates("Title", keep="last").set_index("Title")
+            for col in RESULT_COLS:
+                if col not in processed.columns:
+                    processed[col] = ""
+            processed = processed[RESULT_COLS]
 
-    # 3. 初始化最终 DataFrame
-    df_final = df_original.copy()
-    # 确保列名格式正确
-    desired_columns = ["Title", "标题", "DOI", "Abstract", "摘要"]
-    for col in desired_columns:
-        if col not in df_final.columns:
-            df_final[col] = None
+    # 2. 分块读取原始数据：每块依次同步、处理后追加写入临时文件，全部完成后再替换输出文件，
+    #    峰值内存只与 chunksize 有关（使用names参数来指定列名，忽略第一行的列名）
+    tmp_path = output_path + ".tmp"
+    # 先单独写一次 BOM（方便 Excel 识别 UTF-8），之后每块都用普通 utf-8 追加
+    with open(tmp_path, 'wb') as f:
+        f.write(codecs.BOM_UTF8)
+    reader = pd.read_csv(input_path, names=['Title', 'DOI', 'Abstract'], skiprows=1, chunksize=chunksize)
 
-    # 4. 同步已有结果
+    total_rows = 0
     synced_count = 0
-    if df_results is not None:
-        # 构建处理数据的映射
-        processed_data = {}
-        for idx, row in df_results.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title:
-                continue
-            processed_data[title] = {
-                "标题": row.get("标题", ""),
-                "摘要": row.get("摘要", "")
-            }
-        
-        # 同步数据
-        for idx, row in df_final.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title or title.lower() in ("nan", "none"):
-                continue
-            if title in processed_data:
-                data = processed_data[title]
-                df_final.loc[idx, "标题"] = data.get("标题", "")
-                df_final.loc[idx, "摘要"] = data.get("摘要", "")
-                synced_count += 1
-        print(f"   已同步 {synced_count} 条已处理结果到当前批次。")
-
-    # 5. 收集待处理任务
-    tasks_to_run = []
-    total_rows = len(df_final)
+    rows_to_process = 0
     # 测试模式：只处理前10条
     max_tests = 10
     test_count = 0
-    
-    for idx, row in df_final.iterrows():
-        title = str(row.get("Title", "")).strip()
-        doi = str(row.get("DOI", "")).strip()
-        abstract = str(row.get("Abstract", "")).strip()
-        
-        if not title or title.lower() in ("nan", "none"):
-            continue
-
-        # 检查是否已处理
-        title_translated = row.get("标题")
-        abstract_translated = row.get("摘要")
-        is_processed = False
-        if isinstance(title_translated, str) and title_translated.strip():
-            is_processed = True
-
-        if is_processed:
-            print(f"⏩ 跳过已处理 [{idx+1}/{total_rows}]: {title[:50]}...")
-            continue
-
-        # 测试模式：只添加前10个未处理的
-        if test_count < max_tests:
-            tasks_to_run.append({'index': idx, 'title': title, 'doi': doi, 'abstract': abstract})
-            test_count += 1
-        else:
-            break
 
-    rows_to_process = len(tasks_to_run)
-    print(f"\n--- 待处理总行数: {total_rows} | 新任务数: {rows_to_process} (测试模式) ---")
+    # 每个 key 放入 workers_per_key 份，线程池每新建一个线程就领走一份
+    key_queue = queue.SimpleQueue()
+    for api_key in api_keys * workers_per_key:
+        key_queue.put(api_key)
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=len(api_keys) * workers_per_key, initializer=_init_worker, initargs=(key_queue,)) as executor:
+        for chunk_no, df_original in enumerate(reader):
+            # 处理可能的空值
+            df_original = df_original.fillna('')
+            total_rows += len(df_original)
+
+            # 3. 初始化本块的最终 DataFrame：一次 reindex 补齐结果列（不再先整表 copy 再逐列添加），
+            #    结果列用 string 类型，缺失值为 pd.NA，可直接做向量化字符串操作
+            df_final = df_original.reindex(columns=["Title", "DOI", "Abstract", *RESULT_COLS]).astype({col: "string" for col in RESULT_COLS})
+
+            # 4. 同步已有结果（按标题对齐，整列批量写入）
+            if processed is not None:
+                titles = df_final["Title"].astype(str).str.strip()
+                matched = titles.isin(processed.index) & ~titles.str.lower().isin(["", "nan", "none"])
+                df_final.loc[matched, RESULT_COLS] = processed.loc[titles[matched], RESULT_COLS].to_numpy()
+                synced_count += int(matched.sum())
+
+            # 5. 收集待处理任务（布尔掩码筛选：标题有效且"标题"列尚未填写）
+            titles = df_final["Title"].astype(str).str.strip()
+            valid = ~titles.str.lower().isin(["", "nan", "none"])
+            is_processed = df_final["标题"].str.strip().fillna("").ne("")
+
+            # 测试模式：只添加前10个未处理的
+            pending = df_final.loc[valid & ~is_processed, ["DOI", "Abstract"]].head(max_tests - test_count).astype(str)
+            pending = pd.DataFrame({
+                "title": titles[pending.index],
+                "doi": pending["DOI"].str.strip(),
+                "abstract": pending["Abstract"].str.strip(),
+            })
+            tasks_to_run = pending.rename_axis("index").reset_index().to_dict("records")
+            test_count += len(tasks_to_run)
+
+            print(f"\n--- 第 {chunk_no + 1} 块: {len(df_final)} 行 | 新任务数: {len(tasks_to_run)} ---")
+
+            # 6. 并发处理任务（带进度条和时间估计）：每个线程绑定一个 API key，每个 key 同时最多 workers_per_key 个请求
+            results_list = []
+            if tasks_to_run:
+                # 使用tqdm创建进度条
+                with tqdm(total=len(tasks_to_run), desc="翻译论文", unit="篇", mininterval=0.5) as pbar:
+                    futures = {
+                        executor.submit(translate_with_worker_key, task['title'], task['doi'], task['abstract']): task['index']
+                        for task in tasks_to_run
+                    }
+
+                    for i, future in enumerate(as_completed(futures)):
+                        idx = futures[future]
+                        result = future.result()
+                        results_list.append((idx, result))
+
+                        # 估计剩余时间（按并发下的实际吞吐计算）
+                        elapsed_time = time.time() - start_time
+                        remaining_papers = len(tasks_to_run) - (i + 1)
+                        estimated_remaining_time = elapsed_time / (rows_to_process + i + 1) * remaining_papers
+
+                        # 更新进度条（完成情况由进度条显示，不再逐篇打印）；后缀不单独重绘，由 update 按 mininterval 节流
+                        pbar.set_postfix_str(f"剩余时间: {estimated_remaining_time:.2f}秒", refresh=False)
+                        pbar.update(1)
+                rows_to_process += len(tasks_to_run)
+
+            # 7. 更新本块（所有结果一次性写回）并追加写入临时文件（只有第一块写表头）
+            if results_list:
+                updates = pd.DataFrame.from_dict(
+                    {idx: {csv_col: result.get(json_key, "") for json_key, csv_col in RESULT_COL_MAP.items()} for idx, result in results_list},
+                    orient='index',
+                )
+                rows = df_final.index.get_indexer(updates.index)
+                cols = df_final.columns.get_indexer(RESULT_COLS)
+                df_final.iloc[rows, cols] = updates[RESULT_COLS].to_numpy()
+
+            df_final.to_csv(tmp_path, mode='a', header=chunk_no == 0, index=False, encoding='utf-8', chunksize=WRITE_CHUNKSIZE)
+
+    if processed is not None:
+        print(f"   已同步 {synced_count} 条已处理结果。")
+    print(f"\n--- 总行数: {total_rows} | 新任务数: {rows_to_process} (测试模式) ---")
 
     if rows_to_process == 0:
+        # 没有新结果时保留原输出文件不动
+        os.remove(tmp_path)
         print("🎉 所有测试数据均已处理完成，无需运行新任务。")
         return
 
-    # 6. 处理任务（带进度条和时间估计）
-    api_key_cycler = itertools.cycle(api_keys)
-    results_list = []
-    total_time = 0
-
-    # 使用tqdm创建进度条
-    with tqdm(total=rows_to_process, desc="翻译论文", unit="篇") as pbar:
-        for i, task in enumerate(tasks_to_run):
-            start_time = time.time()
-            idx = task['index']
-            title = task['title']
-            doi = task['doi']
-            abstract = task['abstract']
-            
-            # 获取API密钥
-            api_key = next(api_key_cycler)
-            
-            # 翻译论文
-            result = deepseek_translate_paper_json(title, doi, abstract, api_key)
-            results_list.append((idx, result))
-            
-            # 计算处理时间
-            processing_time = time.time() - start_time
-            total_time += processing_time
-            
-            # 估计剩余时间
-            avg_time_per_paper = total_time / (i + 1)
-            remaining_papers = rows_to_process - (i + 1)
-            estimated_remaining_time = avg_time_per_paper * remaining_papers
-            
-            # 更新进度条
-            pbar.set_postfix_str(f"剩余时间: {estimated_remaining_time:.2f}秒")
-            pbar.update(1)
-            
-            # 显示处理结果
-            print(f"✔ 完成 [{idx+1}/{total_rows}] | 标题: {result.get('Title', 'N/A')[:80]}...")
-
-    # 7. 更新并保存
-    for idx, result in results_list:
-        for json_key, csv_col in RESULT_COL_MAP.items():
-            df_final.at[idx, csv_col] = result.get(json_key, "")
-
-    df_final.to_csv(output_path, index=False, encoding='utf-8-sig')
+    os.replace(tmp_path, output_path)
 
     print(f"\n{'='*60}")
     print(f"🎉 测试完成！共处理 {rows_to_process} 条数据。")
@@ -243,19 +270,10 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str]):
 # 主程序入口
 # ======================
 if __name__ == "__main__":
-    # API密钥列表
-    API_KEYS = [
-        "sk-8c38624bafb9477fb237ab2e58948c1b",
-        "sk-4d5cc37a8b17417c87ed33b94d7b06a7",
-        "sk-ab036985ba2c452f8262f4922e8ab50c",
-        "sk-989bea94ce2b47e59714145005afc87e",
-        "sk-29bc65dfb2de4ed3a983741f815ad2d7",
-        "sk-064831a959c84353b6c4979fa90d16f3",
-        "sk-82923973f2ff4ef895824595474f0df6",
-        "sk-f0556cdf91f74729b7615d46fad4091c",
-        "sk-6019eb2fda48482aa2218d3283f8332d",
-        "sk-c19ad12b9f4b4b078270651858bb7f68",
-    ]
+    # API密钥（环境变量 DEEPSEEK_KEYS，逗号分隔）
+    API_KEYS = tuple(key.strip() for key in os.environ.get("DEEPSEEK_KEYS", "").split(",") if key.strip())
+    if not API_KEYS:
+        raise SystemExit("❌ 请先设置环境变量 DEEPSEEK_KEYS，例如：export DEEPSEEK_KEYS=sk-xxx,sk-yyy")
 
     # 输入输出路径
     INPUT_CSV = r"/home/cuhk/Documents/Test_lx/Find_Paper/ICRA2025/ICRA2025_Title_DOI_Abstract.csv"
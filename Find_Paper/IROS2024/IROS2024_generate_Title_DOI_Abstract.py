@@ -1,52 +1,146 @@
 """
-根据DOI提取IROS 2024论文摘要 (使用代理，带进度条和时间估计)
+根据DOI提取IROS 2024论文摘要 (使用代理，aiohttp 异步并发，带进度条和时间估计)
 """
-import requests
-import re
+import asyncio
+import atexit
+import aiohttp
+import json
 import csv
 import time
 import os
+import random
 from tqdm import tqdm
+from urllib.parse import urlparse
 import datetime
 
 # 代理设置
 PROXY = "http://127.0.0.1:7897"
-PROXIES = {
-    'http': PROXY,
-    'https': PROXY,
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
 }
 
-def extract_abstract_from_doi(doi_url):
-    """从DOI页面提取摘要"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    }
+# 并发设置：同时在途的请求数上限（代替原来每篇固定 sleep 2 秒的限速）
+MAX_CONCURRENCY = 10
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+MIN_INTERVAL_PER_HOST = 0.2  # 同一域名相邻两次请求的最小间隔（秒），即每个域名最多 5 次/秒
+# 重试设置：超时、连接错误或以下状态码时按指数退避（带随机抖动）重试
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 每处理多少篇保存一次（不再每篇都重写整个文件）
+SAVE_EVERY = 50
+
+class HostRateLimiter:
+    """按域名限速（异步版）：同一域名相邻两次请求至少间隔 min_interval 秒，响应快时不额外等待，不同域名互不影响"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_time = {}
+
+    async def wait(self, url):
+        # 事件循环单线程执行，预约时间片这一段中间没有 await，不需要加锁
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        start = max(now, self._next_time.get(host, now))
+        self._next_time[host] = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+RATE_LIMITER = HostRateLimiter(MIN_INTERVAL_PER_HOST)
+
+# 摘要字段的键名；用 str.find 定位，代替对整页 HTML 做正则回溯匹配
+ABSTRACT_KEY = '"abstract"'
+
+def find_abstract(html):
+    """
+    线性扫描 "abstract": "..." 字段，返回第一个非"true"且长度大于 10 的摘要（JSON 转义未解码）；找不到返回空字符串。
+    """
+    n = len(html)
+    pos = html.find(ABSTRACT_KEY)
+    while pos >= 0:
+        # 跳过键名后的空白、冒号、空白，下一个字符必须是开引号
+        i = pos + len(ABSTRACT_KEY)
+        while i < n and html[i].isspace():
+            i += 1
+        if i < n and html[i] == ':':
+            i += 1
+            while i < n and html[i].isspace():
+                i += 1
+            if i < n and html[i] == '"':
+                # 找第一个前面有偶数个反斜杠（即未被转义）的引号作为结束引号
+                end = html.find('"', i + 1)
+                while end >= 0:
+                    backslashes = 0
+                    while html[end - 1 - backslashes] == '\\':
+                        backslashes += 1
+                    if backslashes % 2 == 0:
+                        break
+                    end = html.find('"', end + 1)
+                if end < 0:
+                    return ""
+                match = html[i + 1:end]
+                if match != 'true' and len(match) > 10:
+                    return match
+                pos = html.find(ABSTRACT_KEY, end + 1)
+                continue
+        pos = html.find(ABSTRACT_KEY, pos + 1)
+    return ""
 
+def decode_json_string(s):
+    """解码 JSON 字符串内容（不含两侧引号）：交给 C 实现的 json 解码器，能正确处理 \\uXXXX 与非 ASCII 字符"""
     try:
-        response = requests.get(doi_url, headers=headers, proxies=PROXIES, timeout=30)
-        response.raise_for_status()
-        html = response.text
-
-        # 查找摘要 - 从 "abstract":" 开始
-        abstract_pattern = r'"abstract"\s*:\s*"((?:[^"\\]|\\.)+)"'
-        matches = re.findall(abstract_pattern, html)
+        return json.loads('"' + s + '"', strict=False)
+    except ValueError:
+        # 转义不合法时退回原来的解码方式
+        return s.encode().decode('unicode-escape')
+
+async def fetch_html(session, url, sem):
+    """获取页面文本；遇到暂时性错误时重试，重试用尽后抛出最后一次的异常"""
+    for attempt in range(MAX_RETRIES):
+        # 先在信号量外排队等待限速时间片，等待期间不占用并发名额
+        await RATE_LIMITER.wait(url)
+        try:
+            async with sem, session.get(url, proxy=PROXY, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                return await response.text()
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUSES or attempt == MAX_RETRIES - 1:
+                raise
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES - 1:
+                raise
+        # 退避等待期间不占用并发名额
+        await asyncio.sleep(BACKOFF_SECONDS * 2 ** attempt + random.random())
+
+async def extract_abstract_from_doi(session, doi_url, sem):
+    """从DOI页面提取摘要"""
+    try:
+        html = await fetch_html(session, doi_url, sem)
 
-        if matches:
-            # 获取第一个非"true"的匹配
-            for match in matches:
-                if match != 'true' and len(match) > 10:
-                    # 解码转义字符
-                    abstract = match.encode().decode('unicode-escape')
-                    return abstract
+        # 查找摘要 - 从 "abstract":" 开始，取到第一个有效摘要就停止扫描
+        match = find_abstract(html)
+        if match:
+            # 解码转义字符
+            return decode_json_string(match)
 
         return ""
 
     except Exception as e:
-        print(f"  错误: {e}")
+        # tqdm.write 在进度条上方输出，不打乱进度条
+        tqdm.write(f"  错误: {e}")
         return ""
 
-def scrape_abstracts():
+def save_rows(rows, output_file):
+    """原子保存：先写临时文件再 os.replace，中途崩溃也不会留下写了一半的 CSV"""
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+    os.replace(tmp_file, output_file)
+
+async def scrape_abstracts():
     """爬取所有论文的摘要"""
     input_file = "/home/cuhk/Documents/Test_lx/Find_Paper/IROS2024/IROS2024_Title_DOI.csv"
     output_file = "/home/cuhk/Documents/Test_lx/Find_Paper/IROS2024/IROS2024_Title_DOI_Abstract.csv"
@@ -69,84 +163,76 @@ def scrape_abstracts():
             rows = list(reader)
         print(f"共需处理 {len(rows) - 1} 篇论文")
 
+    # 跳过表头，一次性把每行补齐到 3 列，并筛出还没有摘要的行 (行号, DOI)
+    for row in rows[1:]:
+        row.extend([""] * (3 - len(row)))
+    pending = [(i, rows[i][1]) for i in range(1, len(rows)) if not rows[i][2].strip()]
+
     # 统计初始空摘要数量
-    initial_empty_count = 0
-    for i in range(1, len(rows)):
-        while len(rows[i]) < 3:
-            rows[i].append("")
-        abstract = rows[i][2]
-        if not (abstract and abstract.strip()):
-            initial_empty_count += 1
-    
+    initial_empty_count = len(pending)
     print(f"初始空白摘要数量: {initial_empty_count}")
 
-    # 跳过表头，处理每一行
     processed_count = 0
-    skipped_count = 0
+    skipped_count = len(rows) - 1 - initial_empty_count
     failed_count = 0
     start_time = time.time()
     
     # 计算需要处理的任务数
     total_tasks = initial_empty_count
     
-    # 使用tqdm添加进度条
-    with tqdm(total=len(rows)-1, desc="处理进度", unit="篇") as pbar:
-        for i in range(1, len(rows)):
-            # 确保行有足够的列
-            while len(rows[i]) < 3:
-                rows[i].append("")
-            
-            title = rows[i][0]
-            doi = rows[i][1]
-            abstract = rows[i][2]
-
-            # 如果已经有摘要，跳过
-            if abstract and abstract.strip():
-                skipped_count += 1
+    # 异常退出（如 Ctrl+C）时也把已抓到的摘要保存下来
+    atexit.register(save_rows, rows, output_file)
+    dirty_count = 0
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def fetch(session, i, doi):
+        return i, await extract_abstract_from_doi(session, doi, sem)
+
+    # 使用tqdm添加进度条；所有请求共用一个 ClientSession（连接池复用），由信号量限制并发数
+    # 已有摘要的行直接计入进度，只为待处理的行发请求
+    with tqdm(total=len(rows)-1, initial=skipped_count, desc="处理进度", unit="篇", mininterval=0.5) as pbar:
+        async with aiohttp.ClientSession(headers=HEADERS, connector=aiohttp.TCPConnector(limit=20, limit_per_host=10)) as session:
+            tasks = [fetch(session, i, doi) for i, doi in pending]
+
+            # 谁先完成先处理谁
+            for coro in asyncio.as_completed(tasks):
+                i, new_abstract = await coro
+
+                if new_abstract:
+                    rows[i][2] = new_abstract
+                    processed_count += 1
+                else:
+                    rows[i][2] = ""
+                    failed_count += 1
+
+                # 每处理 SAVE_EVERY 篇保存一次，避免数据丢失
+                dirty_count += 1
+                if dirty_count >= SAVE_EVERY:
+                    save_rows(rows, output_file)
+                    dirty_count = 0
+
+                # 估计剩余时间
+                elapsed_time = time.time() - start_time
+                processed_tasks = processed_count + failed_count
+                if processed_tasks > 0:
+                    avg_time_per_task = elapsed_time / processed_tasks
+                    remaining_tasks = total_tasks - processed_tasks
+                    remaining_time = avg_time_per_task * remaining_tasks
+
+                    # 更新进度条描述（refresh=False：不单独重绘，由下面的 update 按 mininterval 节流）
+                    eta_str = str(datetime.timedelta(seconds=int(remaining_time)))
+                    pbar.set_postfix({"已处理": processed_count, "失败": failed_count, "ETA": eta_str}, refresh=False)
+
+                # 更新进度条
                 pbar.update(1)
-                continue
 
-            # 提取摘要
-            new_abstract = extract_abstract_from_doi(doi)
-
-            if new_abstract:
-                rows[i][2] = new_abstract
-                processed_count += 1
-            else:
-                rows[i][2] = ""
-                failed_count += 1
-
-            # 每处理一篇就保存一次，避免数据丢失
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
-
-            # 更新进度条
-            pbar.update(1)
-            
-            # 估计剩余时间
-            elapsed_time = time.time() - start_time
-            processed_tasks = processed_count + failed_count
-            if processed_tasks > 0:
-                avg_time_per_task = elapsed_time / processed_tasks
-                remaining_tasks = total_tasks - processed_tasks
-                remaining_time = avg_time_per_task * remaining_tasks
-                
-                # 更新进度条描述
-                eta_str = str(datetime.timedelta(seconds=int(remaining_time)))
-                pbar.set_postfix({"已处理": processed_count, "失败": failed_count, "ETA": eta_str})
-
-            # 延迟避免请求过快
-            time.sleep(2)
+    # 保存剩余未落盘的结果
+    save_rows(rows, output_file)
+    atexit.unregister(save_rows)
 
     # 统计最终空摘要数量
-    final_empty_count = 0
-    for i in range(1, len(rows)):
-        while len(rows[i]) < 3:
-            rows[i].append("")
-        abstract = rows[i][2]
-        if not (abstract and abstract.strip()):
-            final_empty_count += 1
+    final_empty_count = sum(1 for row in rows[1:] if not row[2].strip())
 
     print(f"\n{'='*60}")
     print("处理完成！")
@@ -162,4 +248,4 @@ def scrape_abstracts():
     print(f"{'='*60}")
 
 if __name__ == "__main__":
-    scrape_abstracts()
\ No newline at end of file
+    asyncio.run(scrape_abstracts())
\ No newline at end of file
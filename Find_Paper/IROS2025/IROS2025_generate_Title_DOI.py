@@ -2,7 +2,9 @@
 爬取DBLP网站2025年IROS会议论文标题和DOI链接
 """
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 import csv
 
 # 设置VPN代理
@@ -11,27 +13,37 @@ proxies = {
     'https': 'http://127.0.0.1:7897'
 }
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# 超时、连接错误或 429/5xx 时按指数退避自动重试（0.5s、1s、2s）
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+
+# 模块级共享 Session：HTTP keep-alive 复用经代理建立的连接，不再每次请求都重新握手
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.proxies.update(proxies)
+SESSION.mount('http://', HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=RETRY))
+SESSION.mount('https://', HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=RETRY))
+
 def scrape_iros_titles_with_links():
     """爬取IROS 2025论文标题和DOI链接"""
     url = "https://dblp.org/db/conf/iros/iros2025.html"
 
-    # 设置请求头，模拟浏览器访问
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-
     print(f"正在访问: {url}")
 
-    # 发送请求，使用代理
+    # 发送请求（共享 Session 已设置请求头和代理）
     try:
-        response = requests.get(url, headers=headers, proxies=proxies, timeout=30)
+        response = SESSION.get(url, timeout=30)
         response.raise_for_status()
     except Exception as e:
         print(f"请求失败: {e}")
         return []
 
-    # 解析HTML
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # 解析HTML（只解析论文条目的子树）
+    strainer = SoupStrainer('li', class_='entry inproceedings')
+    soup = BeautifulSoup(response.content, 'lxml', parse_only=strainer)
 
     # 查找所有论文条目 (<li class="entry inproceedings">)
     paper_entries = soup.find_all('li', class_='entry inproceedings')
@@ -1,12 +1,14 @@
-import json
+import asyncio
 import os
 import random
+import time
+from collections import deque
 from typing import Dict, Any, List
 
+import orjson
 import pandas as pd
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import itertools
+import pyarrow.csv as pacsv
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, InternalServerError, RateLimitError
 from tqdm import tqdm
 
 # ===========================
@@ -81,191 +83,434 @@ Task 2: 标准化分类 基于提取的理解，从以下三个维度各选出
 '''
 
 # ===========================
-# 核心函数：DeepSeek 论文分析（线程安全）
+# 核心函数：DeepSeek 论文分析（异步，按 API key 限流）
 # ===========================
 
-def deepseek_translate_paper(title: str, abstract: str, api_key: str) -> Dict[str, Any]:
+# 重试设置：限流、服务端错误、连接/超时错误以及输出不是合法 JSON 时，按指数退避（带随机抖动）重试
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 30
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError, orjson.JSONDecodeError)
+# 熔断设置：某个 key 最近 BREAKER_WINDOW 秒内的请求中失败超过一半（且至少 BREAKER_MIN_CALLS 次请求）时，
+# 该 key 暂停 BREAKER_COOLDOWN 秒，期间它的请求原地等待，队列中的任务由其他 key 取走
+BREAKER_WINDOW = 30
+BREAKER_MIN_CALLS = 4
+BREAKER_COOLDOWN = 60
+# 这些状态码说明 key 本身不可用（401 无效/已吊销、402 余额不足、403 无权限），重试和暂停都没有意义，直接停用该 key
+DEAD_KEY_STATUSES = {401, 402, 403}
+
+class KeyLane:
+    """一个 API key 的通道：客户端 + 并发信号量 + 熔断状态"""
+
+    def __init__(self, api_key: str, concurrency: int):
+        # 重试由 call_deepseek_json 统一处理，关闭 SDK 自带的重试
+        self.client = AsyncOpenAI(api_key=api_key, base_url="https://api.deepseek.com", max_retries=0)
+        self.sem = asyncio.Semaphore(concurrency)
+        self._calls = deque()  # 最近的请求 (时间, 是否成功)
+        self._open_until = 0.0
+        self.retired = False
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        self._calls.append((now, ok))
+        while self._calls[0][0] < now - BREAKER_WINDOW:
+            self._calls.popleft()
+        failures = sum(1 for _, success in self._calls if not success)
+        if len(self._calls) >= BREAKER_MIN_CALLS and failures * 2 > len(self._calls):
+            tqdm.write(f"⚠️ API key 错误率过高，暂停 {BREAKER_COOLDOWN} 秒")
+            self._open_until = now + BREAKER_COOLDOWN
+            self._calls.clear()
+
+    def retire(self, status_code: int):
+        if not self.retired:
+            tqdm.write(f"⚠️ API key 不可用（HTTP {status_code}），停用该 key，其任务交给其他 key")
+        self.retired = True
+
+    async def wait_until_closed(self):
+        delay = self._open_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def call_deepseek_json(system_prompt: str, user_prompt: str, lane: KeyLane) -> Dict[str, Any]:
+    """调用 DeepSeek 并解析 JSON 输出；遇到暂时性错误时重试，重试用尽后抛出最后一次的异常"""
+    for attempt in range(MAX_RETRIES):
+        await lane.wait_until_closed()
+        try:
+            async with lane.sem:
+                response = await lane.client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    response_format={'type': 'json_object'},
+                    stream=False,
+                    temperature=0.0
+                )
+            raw_output = response.choices[0].message.content.strip()
+            result = orjson.loads(raw_output)
+            lane.record(True)
+            return result
+
+        except RETRYABLE_ERRORS:
+            lane.record(False)
+            if attempt == MAX_RETRIES - 1:
+                raise
+        except APIStatusError as e:
+            # key 本身不可用时直接停用；其他 4xx（如论文内容导致的 400）是单篇的问题，不计入熔断统计
+            if e.status_code in DEAD_KEY_STATUSES:
+                lane.retire(e.status_code)
+            raise
+        # 退避等待期间不占用并发名额
+        await asyncio.sleep(min(2 ** attempt, MAX_BACKOFF_SECONDS) + random.random())
+
+
+async def deepseek_translate_paper(title: str, abstract: str, lane: KeyLane) -> Dict[str, Any]:
     """使用DeepSeek API翻译论文标题和摘要"""
     user_prompt = f"论文标题：{title}\n摘要：{abstract}"
-    
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": TRANSLATION_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'},
-            stream=False,
-            temperature=0.0
-        )
-        raw_output = response.choices[0].message.content.strip()
-        result = json.loads(raw_output)
-        return result
-
-    except Exception as e:
-        return {
-            "标题": f"[翻译] {title}",
-            "摘要": f"[翻译] {abstract[:100]}..."
-        }
+    return await call_deepseek_json(TRANSLATION_PROMPT, user_prompt, lane)
 
 
-def deepseek_analyze_paper_json(title: str, abstract: str, api_key: str) -> Dict[str, Any]:
+async def deepseek_analyze_paper_json(title: str, abstract: str, lane: KeyLane) -> Dict[str, Any]:
     """使用DeepSeek API分析论文"""
     user_prompt = f"论文标题：{title}\n摘要：{abstract}"
-    
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+    result = await call_deepseek_json(ANALYSIS_PROMPT, user_prompt, lane)
+    result['title'] = title
+    return result
 
+# ===========================
+# 并发调度：每个 API key 一个客户端 + 一个信号量
+# ===========================
+
+async def process_task(task: Dict[str, Any], lane: KeyLane) -> tuple:
+    """翻译和分析互不依赖，两个请求同时发出"""
+    title = task['title']
+    abstract = task['abstract']
+    translate = asyncio.ensure_future(deepseek_translate_paper(title, abstract, lane))
+    analyze = asyncio.ensure_future(deepseek_analyze_paper_json(title, abstract, lane))
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": ANALYSIS_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'},
-            stream=False,
-            temperature=0.0
-        )
-        raw_output = response.choices[0].message.content.strip()
-        result = json.loads(raw_output)
-        result['title'] = title
-        return result
-
-    except Exception as e:
-        return {
-            "title": title,
-            "extracted_keywords": ["N/A"],
-            "classification": {
-                "platform": "其它",
-                "methodology": "其它",
-                "application": "其它"
-            },
-            "summary": "分析失败"
-        }
+        translation, analysis = await asyncio.gather(translate, analyze)
+    except BaseException:
+        # 任一请求失败时取消另一个：整篇已记为失败，不再让它继续重试、占用该 key 的并发名额
+        translate.cancel()
+        analyze.cancel()
+        raise
+    return task['index'], translation, analysis
+
+async def analyze_tasks(tasks_to_run: List[Dict[str, Any]], api_keys: List[str], per_key_concurrency: int, partial_file) -> tuple:
+    """
+    所有任务放进一个共享队列，每个 API key 启动 per_key_concurrency 个消费者从队列取任务，
+    每个 key 同时最多 per_key_concurrency 个请求在途。响应快的 key 自然多取任务，
+    慢的或被限流的 key 少取（熔断暂停期间不取新任务），不再按轮询平均分配；
+    被停用的 key 把手上的任务放回队列后退出，由仍可用的 key 接手；
+    所有任务完成（queue.join）或所有 key 都被停用时结束。
+    每完成一篇就把结果追加写入 partial_file（JSON Lines）。
+    重试用尽的任务不写占位结果，对应行保持为空，下次运行时会被重新处理。
+    """
+    lanes = [KeyLane(key, per_key_concurrency) for key in api_keys]
+
+    queue = asyncio.Queue()
+    for task in tasks_to_run:
+        queue.put_nowait(task)
+
+    rows_to_process = len(tasks_to_run)
+    results_list = []
+    success_count = 0
+    failure_count = 0
+
+    async def worker(lane: KeyLane, pbar: tqdm):
+        nonlocal success_count, failure_count
+        # 队列暂时为空时不退出：其他 key 被停用时可能把任务放回队列；只有本 key 被停用才退出
+        while not lane.retired:
+            # 熔断暂停期间先不取任务，让队列里的任务由其他 key 取走
+            await lane.wait_until_closed()
+            task = await queue.get()
+            if lane.retired:
+                # 等待期间本 key 已被停用（同 key 的其他消费者遇到 401/402/403），任务放回队列
+                queue.put_nowait(task)
+                queue.task_done()
+                break
+            try:
+                idx, translation, analysis = await process_task(task, lane)
+                results_list.extend((row, translation, analysis) for row in task['indices'])
+                success_count += 1
+                # 立即落盘，中途崩溃或 Ctrl+C 也不会丢失已完成的请求
+                record = {"Title": task['title'], **flatten_result(translation, analysis)}
+                partial_file.write(orjson.dumps(record) + b"\n")
+                partial_file.flush()
+                # 显示当前处理的行号和平台
+                platform = analysis.get('classification', {}).get('platform', '其它')
+                # refresh=False：只记下后缀，由 update 按 mininterval 节流统一重绘，不再每完成一篇就写一次终端
+                pbar.set_postfix_str(f"行号: {idx+1}, 平台: {platform}, 剩余: {rows_to_process - (success_count + failure_count)}", refresh=False)
+                pbar.update(1)
+            except Exception as e:
+                if lane.retired:
+                    # key 不可用不是这篇论文的问题，放回队列交给其他 key
+                    queue.put_nowait(task)
+                    queue.task_done()
+                    break
+                failure_count += 1
+                tqdm.write(f"❌ 错误: API 或解析失败: {str(e)[:50]} (标题: {task['title'][:30]}...)")
+                pbar.set_postfix_str(f"行号: {task['index']+1}, 状态: 失败, 剩余: {rows_to_process - (success_count + failure_count)}", refresh=False)
+                pbar.update(1)
+            queue.task_done()
+
+    try:
+        # 使用tqdm显示进度（最多每 0.5 秒重绘一次）
+        with tqdm(total=rows_to_process, desc="处理进度", unit="篇", ncols=100, mininterval=0.5) as pbar:
+            workers = [
+                asyncio.ensure_future(worker(lane, pbar))
+                for lane in lanes
+                for _ in range(per_key_concurrency)
+            ]
+            # 消费者只有在 key 被停用时才会自行退出，全部退出即所有 key 都不可用
+            all_done = asyncio.ensure_future(queue.join())
+            all_retired = asyncio.gather(*workers)
+            try:
+                await asyncio.wait([all_done, all_retired], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                all_done.cancel()
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(all_retired, return_exceptions=True)
+        # 所有 key 都被停用时，队列里剩下的任务记为失败（对应行保持为空，下次运行时重新处理）
+        if not queue.empty():
+            tqdm.write(f"❌ 所有 API key 均不可用，剩余 {queue.qsize()} 篇未处理")
+            failure_count += queue.qsize()
+    finally:
+        for lane in lanes:
+            await lane.client.close()
+    return results_list, success_count, failure_count
 
 # ===========================
 # 批量处理 CSV：自动输出路径 + 断点续传 + 并发
 # ===========================
 
-def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], test_mode: bool = False, test_size: int = 10):
+# 输入 CSV 中需要读取的列（DOI 可选，只用于原样输出）
+INPUT_COLS = ["Title", "DOI", "Abstract"]
+
+# 结果列及已有结果文件缺少该列时的默认值
+RESULT_DEFAULTS = {
+    "标题": "",
+    "摘要": "",
+    "关键词": "N/A",
+    "平台": "其它",
+    "方法": "其它",
+    "应用场景": "其它",
+    "总结": "N/A"
+}
+RESULT_COLS = list(RESULT_DEFAULTS)
+
+# 各结果列视为"缺失、需要重新处理"的取值（去除首尾空白后比较；翻译列另外排除失败时的"[翻译]"占位）。
+# "N/A" 从 CSV 读回时会被解析成缺失值，从 Parquet 读回时原样保留，两种情况都算缺失
+MISSING_VALUES = {
+    "标题": ["", "N/A", "无"],
+    "摘要": ["", "N/A", "无"],
+    "关键词": ["", "N/A"],
+    "平台": ["", "N/A"],
+    "方法": ["", "N/A"],
+    "应用场景": ["", "N/A"],
+    "总结": ["", "分析失败", "N/A"]
+}
+
+# 中间结果文件后缀：运行中逐条追加，输出文件保存成功后删除
+PARTIAL_SUFFIX = ".partial.jsonl"
+
+def load_partial_results(partial_path: str):
+    """读取上次中断时留下的中间结果；最后一行可能只写了一半，解析失败的行直接跳过"""
+    if not os.path.exists(partial_path):
+        return None
+    records = []
+    with open(partial_path, 'rb') as f:
+        for line in f:
+            try:
+                records.append(orjson.loads(line))
+            except ValueError:
+                continue
+    if not records:
+        return None
+    return pd.DataFrame(records, columns=["Title", *RESULT_COLS])
+
+def sync_results(df_final: pd.DataFrame, df_results: pd.DataFrame) -> int:
+    """把已处理结果按标题对齐，整列批量写入 df_final，返回同步的行数"""
+    # 已处理结果按标题去重（同名保留最后一条），缺失的结果列用默认值补齐
+    processed = df_results.assign(Title=df_results["Title"].fillna("").astype(str).str.strip())
+    processed = processed[processed["Title"] != ""].drop_duplicates("Title", keep="last").set_index("Title")
+    for col, default in RESULT_DEFAULTS.items():
+        if col not in processed.columns:
+            processed[col] = default
+
+    titles = df_final["Title"].fillna("").astype(str).str.strip()
+    matched = titles.isin(processed.index) & ~titles.str.lower().isin(["", "nan", "none"])
+    df_final.loc[matched, RESULT_COLS] = processed.loc[titles[matched], RESULT_COLS].to_numpy()
+    return int(matched.sum())
+
+def needs_processing(df: pd.DataFrame) -> pd.Series:
+    """结果列中任一列缺失（或仍是翻译占位）的行"""
+    need_process = pd.Series(False, index=df.index)
+    for col, missing_values in MISSING_VALUES.items():
+        values = df[col].astype("string").str.strip().fillna("")
+        need_process |= values.isin(missing_values)
+        if col in ("标题", "摘要"):
+            need_process |= values.str.startswith("[翻译]")
+    return need_process
+
+def results_cover_all(df_original: pd.DataFrame, df_results: pd.DataFrame) -> bool:
+    """已有结果是否已覆盖本批次全部有效论文（Title 和 Abstract 都不为空）且各结果列都已填写"""
+    if not set(RESULT_COLS).issubset(df_results.columns):
+        return False
+    # 与同步时一致：按标题去重保留最后一条
+    done = df_results.assign(Title=df_results["Title"].astype("string").str.strip().fillna(""))
+    done = done.drop_duplicates("Title", keep="last")
+    done_titles = done.loc[~needs_processing(done) & ~done["Title"].str.lower().isin(["", "nan", "none"]), "Title"]
+
+    titles = df_original["Title"].astype("string").str.strip().fillna("")
+    abstracts = df_original["Abstract"].astype("string").str.strip().fillna("")
+    valid = titles.ne("") & abstracts.ne("")
+    return bool(titles[valid].isin(done_titles).all())
+
+def flatten_result(translation: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """把翻译结果和分析结果展开成一行结果列"""
+    classification = analysis.get("classification", {})
+    return {
+        "标题": translation.get("标题", ""),
+        "摘要": translation.get("摘要", ""),
+        "关键词": ", ".join(analysis.get("extracted_keywords", ["N/A"])),
+        "平台": classification.get("platform", "其它"),
+        "方法": classification.get("methodology", "其它"),
+        "应用场景": classification.get("application", "其它"),
+        "总结": analysis.get("summary", "N/A")
+    }
+
+def report_empty_cells(df_output: pd.DataFrame, total_rows: int, rows_to_process: int):
+    """检查结果列中的空单元格：空值、空字符串、"N/A" 都算空"""
+    print(f"\n🔍 检查空单元格...")
+    
+    target_columns = [col for col in RESULT_COLS if col in df_output.columns]
+
+    # 统计空单元格：空值、空字符串、"N/A" 合并成一个掩码，各列计数和逐行定位都基于它
+    values = df_output[target_columns].apply(lambda col: col.astype("string").str.strip())
+    empty_mask = values.isna() | values.eq("") | values.eq("N/A")
+    empty_cells = empty_mask.sum().to_dict()
+    total_empty = int(empty_mask.to_numpy().sum())
+
+    # 输出检查结果
+    print(f"\n📊 空单元格检查结果:")
+    print(f"   目标运行行数: {total_rows}")
+    print(f"   实际处理行数: {rows_to_process}")
+    print(f"   总空单元格数: {total_empty}")
+    print(f"   各列空单元格数:")
+    for col, count in empty_cells.items():
+        print(f"      {col}: {count}")
+
+    # 检查具体哪些行有空单元格（只展开要输出的前10行）
+    print(f"\n🔍 检查具体空单元格位置...")
+    row_has_empty = empty_mask.any(axis=1)
+    empty_row_count = int(row_has_empty.sum())
+    empty_rows = [
+        (pos + 1, list(empty_mask.columns[empty_mask.iloc[pos].to_numpy()]))  # 行号从1开始
+        for pos in row_has_empty.to_numpy().nonzero()[0][:10]
+    ]
+
+    # 输出有空单元格的行
+    if empty_row_count:
+        print(f"\n⚠️ 发现 {empty_row_count} 行存在空单元格:")
+        # 只输出前10行，避免输出过多
+        for row_num, cols in empty_rows:
+            print(f"      行 {row_num}: 空列 - {', '.join(cols)}")
+        if empty_row_count > 10:
+            print(f"      ... 还有 {empty_row_count - 10} 行未显示")
+    else:
+        print(f"\n✅ 所有单元格均已填充，无空单元格！")
+
+def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], test_mode: bool = False, test_size: int = 10, per_key_concurrency: int = 5):
     # 确保输出目录存在
     output_dir = os.path.dirname(output_path)
     os.makedirs(output_dir, exist_ok=True)
 
-    # 1. 读取原始数据
-    df_original = pd.read_csv(input_path)
-    if "Title" not in df_original.columns or "Abstract" not in df_original.columns:
+    # 1. 读取原始数据：pyarrow 多线程解析，只读取需要的列；摘要里可能带换行，需开启 newlines_in_values。
+    #    列名从流式读取器的 schema 取得（只解析第一个数据块），DOI 可选
+    parse_options = pacsv.ParseOptions(newlines_in_values=True)
+    with pacsv.open_csv(input_path, parse_options=parse_options) as reader:
+        header = reader.schema.names
+    if "Title" not in header or "Abstract" not in header:
         raise ValueError("输入 CSV 文件缺少必要列：Title, Abstract")
-
-    # 2. 尝试加载已有结果（用于续传）
+    table = pacsv.read_csv(
+        input_path,
+        parse_options=parse_options,
+        convert_options=pacsv.ConvertOptions(include_columns=[col for col in INPUT_COLS if col in header], strings_can_be_null=True),
+    )
+    df_original = table.to_pandas()
+
+    # 2. 尝试加载已有结果（用于续传）：优先读取同名 Parquet 文件（列式二进制，无需重新解析文本和推断类型），
+    #    没有时再读取 CSV
+    parquet_path = os.path.splitext(output_path)[0] + ".parquet"
     df_results = None
-    if os.path.exists(output_path):
+    if os.path.exists(parquet_path):
+        print(f"✅ 检测到已有结果文件，尝试读取已处理结果：{parquet_path}")
+        df_results = pd.read_parquet(parquet_path)
+    elif os.path.exists(output_path):
         print(f"✅ 检测到已有输出文件，尝试读取已处理结果：{output_path}")
         df_results = pd.read_csv(output_path)
+    if df_results is not None:
         # 清理列名中的空格
         df_results.columns = df_results.columns.str.strip()
         if "Title" not in df_results.columns:
             print("⚠️ 警告: 输出文件缺少 'Title' 列，将忽略已存在的结果。")
             df_results = None
 
+    # 已有结果已覆盖全部论文且没有中断留下的中间结果时，无需同步、扫描和重写输出文件
+    partial_path = output_path + PARTIAL_SUFFIX
+    if df_results is not None and not os.path.exists(partial_path) and results_cover_all(df_original, df_results):
+        print("🎉 已有结果已覆盖本批次全部论文，无需运行新任务。")
+        report_empty_cells(df_results, len(df_original), 0)
+        return
+
     # 3. 初始化最终 DataFrame
     df_final = df_original.copy()
     # 确保列名格式正确
-    desired_columns = ["标题", "摘要", "关键词", "平台", "方法", "应用场景", "总结"]
-    for col in desired_columns:
+    for col in RESULT_COLS:
         if col not in df_final.columns:
             df_final[col] = None
 
-    # 4. 同步已有结果
+    # 4. 同步已有结果（按标题对齐，整列批量写入）
     synced_count = 0
     if df_results is not None:
-        # 构建处理数据的映射
-        processed_data = {}
-        for idx, row in df_results.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title:
-                continue
-            processed_data[title] = {
-                "标题": row.get("标题", ""),
-                "摘要": row.get("摘要", ""),
-                "关键词": row.get("关键词", "N/A"),
-                "平台": row.get("平台", "其它"),
-                "方法": row.get("方法", "其它"),
-                "应用场景": row.get("应用场景", "其它"),
-                "总结": row.get("总结", "N/A")
-            }
-        
-        # 同步数据
-        for idx, row in df_final.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title or title.lower() in ("nan", "none"):
-                continue
-            if title in processed_data:
-                data = processed_data[title]
-                df_final.loc[idx, "标题"] = data.get("标题", "")
-                df_final.loc[idx, "摘要"] = data.get("摘要", "")
-                df_final.loc[idx, "关键词"] = data.get("关键词", "N/A")
-                df_final.loc[idx, "平台"] = data.get("平台", "其它")
-                df_final.loc[idx, "方法"] = data.get("方法", "其它")
-                df_final.loc[idx, "应用场景"] = data.get("应用场景", "其它")
-                df_final.loc[idx, "总结"] = data.get("总结", "N/A")
-                synced_count += 1
+        synced_count = sync_results(df_final, df_results)
         print(f"   已同步 {synced_count} 条已处理结果到当前批次。")
 
-    # 5. 收集待处理任务
-    tasks_to_run = []
+    # 回放上次中断前已完成、但还没保存进输出文件的中间结果
+    df_partial = load_partial_results(partial_path)
+    if df_partial is not None:
+        print(f"✅ 检测到上次中断留下的中间结果：{partial_path}")
+        print(f"   已回放 {sync_results(df_final, df_partial)} 条中间结果。")
+
+    # 5. 收集待处理任务（整列布尔掩码筛选，不再逐行 iterrows）
     total_rows = len(df_final)
-    skipped_rows = 0
-    need_process_count = 0
-    
+
     print(f"\n🔍 扫描 {total_rows} 行数据，筛选需要处理的任务...")
-    
-    for idx, row in df_final.iterrows():
-        # 检查Title和Abstract是否完整
-        title = str(row.get("Title", "")).strip()
-        abstract = str(row.get("Abstract", "")).strip()
-        
-        if not title or not abstract:
-            skipped_rows += 1
-            continue
-
-        # 检查是否有任何缺少的内容
-        need_process = False
-        
-        # 检查翻译
-        title_trans = str(row.get("标题", "")).strip()
-        abstract_trans = str(row.get("摘要", "")).strip()
-        if pd.isna(row.get("标题")) or title_trans == "" or title_trans.startswith("[翻译]") or title_trans == "无":
-            need_process = True
-        if pd.isna(row.get("摘要")) or abstract_trans == "" or abstract_trans.startswith("[翻译]") or abstract_trans == "无":
-            need_process = True
-        
-        # 检查分析
-        keywords = str(row.get("关键词", "")).strip()
-        platform = str(row.get("平台", "")).strip()
-        methodology = str(row.get("方法", "")).strip()
-        application = str(row.get("应用场景", "")).strip()
-        summary = str(row.get("总结", "")).strip()
-        if pd.isna(row.get("关键词")) or keywords == "" or keywords == "N/A":
-            need_process = True
-        if pd.isna(row.get("平台")) or platform == "":
-            need_process = True
-        if pd.isna(row.get("方法")) or methodology == "":
-            need_process = True
-        if pd.isna(row.get("应用场景")) or application == "":
-            need_process = True
-        if pd.isna(row.get("总结")) or summary == "" or summary == "分析失败" or summary == "N/A":
-            need_process = True
-
-        if need_process:
-            tasks_to_run.append({'index': idx, 'title': title, 'abstract': abstract})
-            need_process_count += 1
+
+    # 检查Title和Abstract是否完整（缺失值按空字符串处理）
+    titles = df_final["Title"].astype("string").str.strip().fillna("")
+    abstracts = df_final["Abstract"].astype("string").str.strip().fillna("")
+    valid = titles.ne("") & abstracts.ne("")
+    skipped_rows = int((~valid).sum())
+
+    # 检查是否有任何缺少的翻译或分析结果
+    pending = valid & needs_processing(df_final)
+    need_process_count = int(pending.sum())
+
+    # 标题和摘要完全相同的重复论文只请求一次，结果写回所有重复行（indices）
+    pending_papers = pd.DataFrame({"title": titles[pending], "abstract": abstracts[pending]})
+    groups = pending_papers.groupby(["title", "abstract"], sort=False).groups
+    tasks_to_run = [
+        {'index': rows[0], 'indices': list(rows), 'title': title, 'abstract': abstract}
+        for (title, abstract), rows in groups.items()
+    ]
 
     print(f"   跳过 {skipped_rows} 行（Title或Abstract不完整）")
     print(f"   需要处理 {need_process_count} 行（缺少翻译或分析结果）")
+    if len(tasks_to_run) < need_process_count:
+        print(f"   去除重复论文后剩余 {len(tasks_to_run)} 个任务")
 
     # 测试模式：按顺序取前N个任务
     if test_mode and tasks_to_run:
@@ -275,70 +520,17 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], te
     rows_to_process = len(tasks_to_run)
     print(f"\n--- 待处理总行数: {total_rows} | 实际处理任务数: {rows_to_process} ---")
 
-    if rows_to_process == 0:
+    # 有回放的中间结果时仍需往下走，把它们保存进输出文件
+    if rows_to_process == 0 and df_partial is None:
         print("🎉 所有数据均已处理完成，无需运行新任务。")
         return
 
-    # 6. 并发处理
-    api_key_cycler = itertools.cycle(api_keys)
-    max_workers = min(len(api_keys), 10)  # 防止线程过多（可调）
-    results_list = []
-    success_count = 0
-    failure_count = 0
-
-    print(f"\n🚀 开始处理 {rows_to_process} 个任务...")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {}
-        for task in tasks_to_run:
-            print(f"\ntask = {task}\n")
-            idx = task['index']
-            title = task['title']
-            abstract = task['abstract']
-            key = next(api_key_cycler)
-            
-            # 先翻译，再分析
-            def process_task(idx, title, abstract, key):
-                # 翻译
-                try:
-                    translation = deepseek_translate_paper(title, abstract, key)
-                except Exception as e:
-                    translation = {"标题": f"[翻译] {title}", "摘要": f"[翻译] {abstract[:100]}..."}
-                # 分析
-                try:
-                    analysis = deepseek_analyze_paper_json(title, abstract, key)
-                except Exception as e:
-                    analysis = {
-                        "title": title,
-                        "extracted_keywords": ["N/A"],
-                        "classification": {
-                            "platform": "其它",
-                            "methodology": "其它",
-                            "application": "其它"
-                        },
-                        "summary": "分析失败"
-                    }
-                return idx, translation, analysis
-            
-            future = executor.submit(process_task, idx, title, abstract, key)
-            futures[future] = idx
-
-        # 使用tqdm显示进度
-        with tqdm(total=rows_to_process, desc="处理进度", unit="篇", ncols=100) as pbar:
-            for future in as_completed(futures):
-                idx = futures[future]
-                try:
-                    idx, translation, analysis = future.result()
-                    results_list.append((idx, translation, analysis))
-                    success_count += 1
-                    # 显示当前处理的行号和平台
-                    platform = analysis.get('classification', {}).get('platform', '其它')
-                    pbar.update(1)
-                    pbar.set_postfix({"行号": idx+1, "平台": platform, "剩余": rows_to_process - (success_count + failure_count)})
-                except Exception as e:
-                    failure_count += 1
-                    pbar.update(1)
-                    pbar.set_postfix({"行号": idx+1, "状态": "失败", "剩余": rows_to_process - (success_count + failure_count)})
+    # 6. 并发处理（asyncio：每个 key 同时最多 per_key_concurrency 个请求在途）
+    results_list, success_count, failure_count = [], 0, 0
+    if tasks_to_run:
+        print(f"\n🚀 开始处理 {rows_to_process} 个任务...")
+        with open(partial_path, 'ab') as partial_file:
+            results_list, success_count, failure_count = asyncio.run(analyze_tasks(tasks_to_run, api_keys, per_key_concurrency, partial_file))
 
     # 显示处理统计
     print(f"\n📊 处理统计:")
@@ -346,18 +538,16 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], te
     print(f"   成功: {success_count}")
     print(f"   失败: {failure_count}")
 
-    # 7. 更新并保存
+    # 7. 更新并保存（所有结果一次性写回）
     print(f"\n💾 更新并保存结果...")
-    for idx, translation, analysis in results_list:
-        # 更新翻译
-        df_final.at[idx, "标题"] = translation.get("标题", "")
-        df_final.at[idx, "摘要"] = translation.get("摘要", "")
-        # 更新分析
-        df_final.at[idx, "关键词"] = ", ".join(analysis.get("extracted_keywords", ["N/A"]))
-        df_final.at[idx, "平台"] = analysis.get("classification", {}).get("platform", "其它")
-        df_final.at[idx, "方法"] = analysis.get("classification", {}).get("methodology", "其它")
-        df_final.at[idx, "应用场景"] = analysis.get("classification", {}).get("application", "其它")
-        df_final.at[idx, "总结"] = analysis.get("summary", "N/A")
+    if results_list:
+        updates = pd.DataFrame.from_dict(
+            {idx: flatten_result(translation, analysis) for idx, translation, analysis in results_list},
+            orient='index',
+        )
+        rows = df_final.index.get_indexer(updates.index)
+        cols = df_final.columns.get_indexer(RESULT_COLS)
+        df_final.iloc[rows, cols] = updates[RESULT_COLS].to_numpy()
 
     # 8. 保存结果
     # 只保存需要的列
@@ -365,72 +555,14 @@ def batch_process_csv(input_path: str, output_path: str, api_keys: List[str], te
     df_output = df_final[[col for col in output_columns if col in df_final.columns]]
     
     df_output.to_csv(output_path, index=False, encoding='utf-8-sig')
-
-    # 9. 检查空单元格
-    print(f"\n🔍 检查空单元格...")
-    
-    # 读取保存后的文件进行检查
-    df_check = pd.read_csv(output_path)
-    df_check.columns = df_check.columns.str.strip()
-    
-    # 目标列
-    target_columns = ["标题", "摘要", "关键词", "平台", "方法", "应用场景", "总结"]
-    
-    # 统计空单元格
-    empty_cells = {}
-    total_empty = 0
-    
-    for col in target_columns:
-        if col in df_check.columns:
-            # 检查空值
-            empty_count = df_check[col].isna().sum()
-            # 检查空字符串
-            empty_string_count = df_check[col].astype(str).str.strip().eq('').sum()
-            # 检查"N/A"值
-            na_count = df_check[col].astype(str).str.strip().eq('N/A').sum()
-            
-            # 总空值数
-            total_empty_in_col = empty_count + empty_string_count + na_count
-            empty_cells[col] = total_empty_in_col
-            total_empty += total_empty_in_col
-    
-    # 输出检查结果
-    print(f"\n📊 空单元格检查结果:")
-    print(f"   目标运行行数: {total_rows}")
-    print(f"   实际处理行数: {rows_to_process}")
-    print(f"   总空单元格数: {total_empty}")
-    print(f"   各列空单元格数:")
-    for col, count in empty_cells.items():
-        print(f"      {col}: {count}")
-    
-    # 检查具体哪些行有空单元格
-    print(f"\n🔍 检查具体空单元格位置...")
-    empty_rows = []
-    
-    for idx, row in df_check.iterrows():
-        row_empty = False
-        empty_cols = []
-        
-        for col in target_columns:
-            if col in df_check.columns:
-                value = row.get(col, "")
-                if pd.isna(value) or str(value).strip() == "" or str(value).strip() == "N/A":
-                    row_empty = True
-                    empty_cols.append(col)
-        
-        if row_empty:
-            empty_rows.append((idx+1, empty_cols))  # 行号从1开始
-    
-    # 输出有空单元格的行
-    if empty_rows:
-        print(f"\n⚠️ 发现 {len(empty_rows)} 行存在空单元格:")
-        # 只输出前10行，避免输出过多
-        for i, (row_num, cols) in enumerate(empty_rows[:10]):
-            print(f"      行 {row_num}: 空列 - {', '.join(cols)}")
-        if len(empty_rows) > 10:
-            print(f"      ... 还有 {len(empty_rows) - 10} 行未显示")
-    else:
-        print(f"\n✅ 所有单元格均已填充，无空单元格！")
+    # 同时保存一份 Parquet 供下次续传读取（CSV 仍作为给人看的结果）
+    df_output.to_parquet(parquet_path, index=False, compression="zstd")
+    # 结果已全部写进输出文件，中间结果不再需要
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    # 9. 检查空单元格（直接检查内存中刚保存的数据，不再把输出文件重新读一遍）
+    report_empty_cells(df_output, total_rows, rows_to_process)
     
     print(f"\n{'='*60}")
     print(f"🎉 全部处理完成！共处理 {rows_to_process} 行数据。")
@@ -453,19 +585,10 @@ if __name__ == "__main__":
     test_mode = args.test
     test_size = args.test_size
     
-    # API密钥列表
-    API_KEYS = [
-        "sk-8c38624bafb9477fb237ab2e58948c1b",
-        "sk-4d5cc37a8b17417c87ed33b94d7b06a7",
-        "sk-ab036985ba2c452f8262f4922e8ab50c",
-        "sk-989bea94ce2b47e59714145005afc87e",
-        "sk-29bc65dfb2de4ed3a983741f815ad2d7",
-        "sk-064831a959c84353b6c4979fa90d16f3",
-        "sk-82923973f2ff4ef895824595474f0df6",
-        "sk-f0556cdf91f74729b7615d46fad4091c",
-        "sk-6019eb2fda48482aa2218d3283f8332d",
-        "sk-c19ad12b9f4b4b078270651858bb7f68",
-    ]
+    # API密钥（环境变量 DEEPSEEK_KEYS，逗号分隔）
+    API_KEYS = tuple(key.strip() for key in os.environ.get("DEEPSEEK_KEYS", "").split(",") if key.strip())
+    if not API_KEYS:
+        raise SystemExit("❌ 请先设置环境变量 DEEPSEEK_KEYS，例如：export DEEPSEEK_KEYS=sk-xxx,sk-yyy")
 
     # 输入输出路径
     input_dir = f"/home/cuhk/Documents/Test_lx/Find_Paper/{conference}"
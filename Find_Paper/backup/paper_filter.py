@@ -1,10 +1,11 @@
 # medical_paper_filter_batch_processor_FIXED_V5.py
-import json
 import os
 import re
 import math
+import threading
 from typing import Dict, Any, List
 
+import orjson
 import pandas as pd
 from openai import OpenAI
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -35,7 +36,7 @@ SYSTEM_PROMPT = f'''你是一名医学人工智能方向的科研助理，当前
 
 请严格仅输出 JSON 格式的字符串，不要输出任何额外说明或 Markdown 格式。
 你必须严格遵循以下 **JSON** 格式输出，Title 字段必须是输入的原标题：
-{json.dumps(JSON_OUTPUT_TEMPLATE, ensure_ascii=False, indent=2)}
+{orjson.dumps(JSON_OUTPUT_TEMPLATE, option=orjson.OPT_INDENT_2).decode()}
 '''
 
 
@@ -43,10 +44,21 @@ SYSTEM_PROMPT = f'''你是一名医学人工智能方向的科研助理，当前
 # 核心函数：DeepSeek 论文标题判断（线程安全）
 # ===========================
 
+# 每个 API key 只创建一个客户端，各线程共享其 HTTP 连接池，避免每篇论文都重新建立 TLS 连接
+_CLIENTS: Dict[str, OpenAI] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(api_key: str) -> OpenAI:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            client = _CLIENTS[api_key] = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+        return client
+
 def deepseek_judge_paper_json(title: str, api_key: str) -> Dict[str, Any]:
     user_prompt = f"论文标题：{title}"
     
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+    client = get_client(api_key)
 
     try:
         response = client.chat.completions.create(
@@ -60,7 +72,7 @@ def deepseek_judge_paper_json(title: str, api_key: str) -> Dict[str, Any]:
             temperature=0.0
         )
         raw_output = response.choices[0].message.content.strip()
-        result = json.loads(raw_output)
+        result = orjson.loads(raw_output)
         result['Original_Title'] = title
         return result
 
@@ -128,47 +140,36 @@ def batch_process_excel(input_path: str, api_keys: List[str]):
         if col not in df_final.columns:
             df_final[col] = None
 
-    # 4. 同步已有结果
+    # 4. 同步已有结果（按标题对齐，整列批量写入）
     synced_count = 0
     if df_results is not None:
-        processed_data = df_results.set_index('Title')[RESULT_COLS]
-        for idx, row in df_final.iterrows():
-            title = str(row.get("Title", "")).strip()
-            if not title or title.lower() in ("nan", "none"):
-                continue
-            if title in processed_data.index:
-                rec = processed_data.loc[title, 'Recommendation']
-                is_filled = (
-                    isinstance(rec, str)
-                    and rec.strip().lower() not in ["", "none", "nan", "n/a"]
-                    and pd.notna(rec)
-                )
-                if is_filled:
-                    for col in RESULT_COLS:
-                        df_final.loc[idx, col] = processed_data.loc[title, col]
-                    synced_count += 1
+        # 已处理结果按标题去重（同名保留最后一条），只同步"Recommendation"已填写的结果
+        processed = df_results.assign(Title=df_results["Title"].astype("string").str.strip().fillna(""))
+        processed = processed[processed["Title"] != ""].drop_duplicates("Title", keep="last").set_index("Title")
+        for col in RESULT_COLS:
+            if col not in processed.columns:
+                processed[col] = None
+        rec = processed["Recommendation"].astype("string").str.strip().str.lower().fillna("")
+        processed = processed.loc[~rec.isin(["", "none", "nan", "n/a"]), RESULT_COLS]
+
+        titles = df_final["Title"].astype("string").str.strip().fillna("")
+        matched = titles.isin(processed.index) & ~titles.str.lower().isin(["", "nan", "none"])
+        df_final.loc[matched, RESULT_COLS] = processed.loc[titles[matched], RESULT_COLS].to_numpy()
+        synced_count = int(matched.sum())
         print(f"   已同步 {synced_count} 条已处理结果到当前批次。")
 
-    # 5. 收集待处理任务
-    tasks_to_run = []
+    # 5. 收集待处理任务（布尔掩码筛选：标题有效且"Recommendation"尚未填写，不再逐行 iterrows）
     total_rows = len(df_final)
-    for idx, row in df_final.iterrows():
-        title = str(row.get("Title", "")).strip()
-        if not title or title.lower() in ("nan", "none"):
-            continue
-
-        recommendation_value = row.get("Recommendation")
-        is_processed = False
-        if isinstance(recommendation_value, str) and recommendation_value.strip().lower() not in ["", "none", "nan", "n/a"]:
-            is_processed = True
-        elif pd.notna(recommendation_value):
-            is_processed = False
+    titles = df_final["Title"].astype("string").str.strip().fillna("")
+    valid = ~titles.str.lower().isin(["", "nan", "none"])
+    rec = df_final["Recommendation"].astype("string").str.strip().str.lower().fillna("")
+    is_processed = ~rec.isin(["", "none", "nan", "n/a"])
+    skipped_count = int((valid & is_processed).sum())
+    if skipped_count:
+        print(f"⏩ 跳过已处理 {skipped_count} 行")
 
-        if is_processed:
-            print(f"⏩ 跳过已处理 [{idx+1}/{total_rows}]: {title[:50]}...")
-            continue
-
-        tasks_to_run.append({'index': idx, 'title': title})
+    pending = titles[valid & ~is_processed]
+    tasks_to_run = [{'index': idx, 'title': title} for idx, title in pending.items()]
 
     rows_to_process = len(tasks_to_run)
     print(f"\n--- 待处理总行数: {total_rows} | 新任务数: {rows_to_process} ---")
@@ -200,10 +201,15 @@ def batch_process_excel(input_path: str, api_keys: List[str]):
             except Exception as e:
                 print(f"❌ 线程执行错误 (Index: {idx}): {e}")
 
-    # 7. 更新并保存
-    for idx, result in results_list:
-        for json_key, excel_col in RESULT_COL_MAP.items():
-            df_final.at[idx, excel_col] = result.get(json_key, "N/A")
+    # 7. 更新并保存（所有结果一次性写回）
+    if results_list:
+        updates = pd.DataFrame.from_dict(
+            {idx: {excel_col: result.get(json_key, "N/A") for json_key, excel_col in RESULT_COL_MAP.items()} for idx, result in results_list},
+            orient='index',
+        )
+        rows = df_final.index.get_indexer(updates.index)
+        cols = df_final.columns.get_indexer(RESULT_COLS)
+        df_final.iloc[rows, cols] = updates[RESULT_COLS].to_numpy()
 
     df_final.to_excel(output_path, index=False)
 
@@ -217,18 +223,10 @@ def batch_process_excel(input_path: str, api_keys: List[str]):
 # 主程序入口
 # ======================
 if __name__ == "__main__":
-    API_KEYS = [
-        "sk-8c38624bafb9477fb237ab2e58948c1b",
-        "sk-4d5cc37a8b17417c87ed33b94d7b06a7",
-        "sk-ab036985ba2c452f8262f4922e8ab50c",
-        "sk-989bea94ce2b47e59714145005afc87e",
-        "sk-29bc65dfb2de4ed3a983741f815ad2d7",
-        "sk-064831a959c84353b6c4979fa90d16f3",
-        "sk-82923973f2ff4ef895824595474f0df6",
-        "sk-f0556cdf91f74729b7615d46fad4091c",
-        "sk-6019eb2fda48482aa2218d3283f8332d",
-        "sk-c19ad12b9f4b4b078270651858bb7f68",
-    ]
+    # API密钥（环境变量 DEEPSEEK_KEYS，逗号分隔）
+    API_KEYS = tuple(key.strip() for key in os.environ.get("DEEPSEEK_KEYS", "").split(",") if key.strip())
+    if not API_KEYS:
+        raise SystemExit("❌ 请先设置环境变量 DEEPSEEK_KEYS，例如：export DEEPSEEK_KEYS=sk-xxx,sk-yyy")
 
     INPUT_EXCEL = r"E:OneDrive - CUHK-ShenzhenOutside School2511MED_Interncodefind_paperoutputgoogle_scholar_output.xlsx"
 
@@ -1,48 +1,49 @@
 import csv
-from collections import defaultdict
+from itertools import islice
+
+import numpy as np
+import pandas as pd
 
 file_path = '/home/cuhk/Documents/Test_lx/Find_Paper/ICRA2024/ICRA2024_Title_DOI_Abstract_标题_摘要.csv'
 
-# 使用csv模块读取文件
+# 用csv模块扫一遍文件，只记录每行的字段数（用于检查列数不一致），并保留前5行供预览
 with open(file_path, 'r', encoding='utf-8') as f:
     reader = csv.reader(f)
-    rows = list(reader)
+    headers = next(reader)
+    preview = [headers, *islice(reader, 4)]
+    widths = np.array([len(row) for row in preview[1:]] + [len(row) for row in reader], dtype=np.int64)
 
-# 获取列名
-headers = rows[0]
 print('列名:', headers)
 print()
 
-# 统计每列的空白单元格数量
-empty_counts = defaultdict(int)
-total_rows = len(rows) - 1
+# 单元格统计交给pandas的C引擎：所有列按字符串读取，不把 'N/A'、'nan'、'None' 转成缺失值，保留空白行；
+# 列数按最宽的行展开，超出表头的列命名为 Column_j
+n_cols = max(len(headers), int(widths.max(initial=0)))
+names = headers + [f'Column_{j}' for j in range(len(headers), n_cols)]
+df = pd.read_csv(file_path, header=None, skiprows=1, names=names, dtype=str, keep_default_na=False, skip_blank_lines=False)
 
-print('每列的空白单元格数量:')
-for i, row in enumerate(rows[1:], start=1):
-    for j, cell in enumerate(row):
-        if not cell or cell.strip() in ['', ' ', 'N/A', 'nan', 'None']:
-            col_name = headers[j] if j < len(headers) else f'Column_{j}'
-            empty_counts[col_name] += 1
+# 统计每列的空白单元格数量：整列向量化判断，字段数不足的行里缺少的单元格不计入
+present = np.arange(n_cols) < widths[:, None]
+stripped = df.apply(lambda col: col.str.strip())
+empty_mask = stripped.isin(['', 'N/A', 'nan', 'None']) & present
+empty_counts = empty_mask.sum()
+total_rows = len(df)
 
-for col, count in empty_counts.items():
+print('每列的空白单元格数量:')
+for col, count in empty_counts[empty_counts > 0].items():
     print(f'{col}: {count} ({count/total_rows*100:.2f}%)')
 
 print(f'\n总行数: {total_rows}')
 print('\n检查是否有列数不一致的行:')
-inconsistent_rows = []
-for i, row in enumerate(rows[1:], start=1):
-    if len(row) != len(headers):
-        inconsistent_rows.append(i)
-        print(f'第{i}行: 列数={len(row)}, 预期列数={len(headers)}')
+inconsistent_rows = np.flatnonzero(widths != len(headers)) + 1
+for i in inconsistent_rows:
+    print(f'第{i}行: 列数={widths[i - 1]}, 预期列数={len(headers)}')
 
 print(f'\n列数不一致的行数: {len(inconsistent_rows)}')
 
 # 检查是否有完全空白的行
 print('\n检查是否有完全空白的行:')
-blank_rows = []
-for i, row in enumerate(rows[1:], start=1):
-    if all(not cell or cell.strip() == '' for cell in row):
-        blank_rows.append(i)
+blank_rows = (np.flatnonzero((stripped.eq('') | ~present).all(axis=1)) + 1).tolist()
 
 if blank_rows:
     print(f'发现 {len(blank_rows)} 个完全空白的行: {blank_rows}')
@@ -51,5 +52,5 @@ else:
 
 # 预览前几行数据
 print('\n前5行数据预览:')
-for i, row in enumerate(rows[:5]):
-    print(f'第{i}行: {row}')
\ No newline at end of file
+for i, row in enumerate(preview):
+    print(f'第{i}行: {row}')